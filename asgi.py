@@ -0,0 +1,233 @@
+"""
+Entrada ASGI: as mesmas rotas do app Flask (app.py), com a E/S dos corpos no
+event loop e o trabalho de CPU num executor limitado.
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --workers 2 --timeout 120 --preload
+
+Corpos de até ASGI_BUFFER_BYTES são recebidos inteiros no loop e só então a view
+roda numa das ASGI_THREADS threads do worker: classificação, montagem da grade
+e serialização acontecem lá. Cliente lento com corpo pequeno ocupa só uma
+corrotina; as threads ficam para quem já tem o corpo inteiro.
+
+Corpo maior que isso, ou rota de STREAM_ROUTES (/classify-stream, que devolve
+linhas enquanto o upload continua), não espera: a view começa com o que já
+chegou e lê o resto do wsgi.input, alimentado pelo loop através de uma fila de
+até ASGI_QUEUE_CHUNKS pedaços. O parse incremental da M0 e o fluxo do
+/classify-stream valem como no gunicorn; em troca, essa view segura a thread
+enquanto o corpo chega (no máximo ASGI_READ_TIMEOUT parado).
+
+A resposta volta para o loop e sai em pedaços de ASGI_SEND_CHUNK, no ritmo do
+cliente.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "2"))                  # views simultâneas por worker
+ASGI_BUFFER_BYTES = int(os.environ.get("ASGI_BUFFER_BYTES", str(1024 * 1024)))  # acima disso a view lê em fluxo
+ASGI_QUEUE_CHUNKS = 16                                                   # pedaços lidos à frente da view
+ASGI_READ_TIMEOUT = float(os.environ.get("ASGI_READ_TIMEOUT", "120"))    # segundos sem chegar nada do corpo
+ASGI_SEND_CHUNK = 64 * 1024
+
+# rotas cuja resposta sai enquanto o corpo ainda chega: a view começa sem esperar
+STREAM_ROUTES = {"/classify-stream"}
+
+_pool = None
+
+def executor() -> ThreadPoolExecutor:
+    # criado no primeiro uso: com --preload o master não leva threads para o fork
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(ASGI_THREADS, thread_name_prefix="asgi")
+    return _pool
+
+def route(method: str, path: str):
+    try:
+        rule, _ = flask_app.url_map.bind("localhost").match(path, method, return_rule=True)
+    except HTTPException:
+        return None
+    return rule.rule
+
+def body_limit(rule) -> int:
+    """O mesmo teto do LimitedRequest, decidido antes de ler o corpo."""
+    return flask_app.config["BODY_LIMITS"].get(rule, flask_app.config["MAX_BODY_BYTES"])
+
+def _latin1(value: str) -> str:
+    return value.encode("utf-8").decode("latin-1")
+
+def wsgi_environ(scope, body, length):
+    script_name = _latin1(scope.get("root_path", ""))
+    path_info = _latin1(scope["path"])
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if length is not None:
+        environ["CONTENT_LENGTH"] = str(length)
+    for name, value in scope.get("headers", ()):
+        name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue  # vale o tamanho recebido ou o declarado (ausente em chunked)
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def _send_json(send, status: int, body: bytes):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+class QueueInput(io.RawIOBase):
+    """
+    wsgi.input de uma view que começa antes do fim do corpo: o que já tinha
+    chegado e, depois, os pedaços que pump() põe na fila. Lido na thread da view.
+    """
+
+    def __init__(self, loop, head: bytes, queue: asyncio.Queue):
+        self.loop, self.queue = loop, queue
+        self.buf, self.pos, self.eof = head, 0, False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while self.pos >= len(self.buf):
+            if self.eof:
+                return 0
+            future = asyncio.run_coroutine_threadsafe(self.queue.get(), self.loop)
+            try:
+                item = future.result(ASGI_READ_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise OSError(f"corpo parado há {ASGI_READ_TIMEOUT:.0f}s") from None
+            if isinstance(item, Exception):
+                raise item  # o LimitedStream do werkzeug transforma em ClientDisconnected (400)
+            if item is None:
+                self.eof = True
+            else:
+                self.buf, self.pos = item, 0
+        n = min(len(b), len(self.buf) - self.pos)
+        b[:n] = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+async def pump(receive, queue: asyncio.Queue):
+    """Passa o resto do corpo para a fila da QueueInput; None no fim, OSError se o cliente desconectou."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            await queue.put(OSError("cliente desconectou antes do fim do corpo"))
+            return
+        if message.get("body"):
+            await queue.put(message["body"])
+        if not message.get("more_body", False):
+            await queue.put(None)
+            return
+
+async def http(scope, receive, send):
+    rule = route(scope["method"], scope["path"])
+    limit = body_limit(rule)
+    declared = dict(scope.get("headers", ())).get(b"content-length")
+    declared = int(declared) if declared and declared.isdigit() else None
+    head, more = bytearray(), True
+    if declared is not None and declared > limit:
+        head = None
+    # corpo pequeno: inteiro aqui, antes de ocupar uma thread
+    while head is not None and more and rule not in STREAM_ROUTES and len(head) <= ASGI_BUFFER_BYTES:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        head += message.get("body", b"")
+        more = message.get("more_body", False)
+        if len(head) > limit:
+            head = None
+    if head is None:
+        await _send_json(send, 413, flask_app.json.dumpb(
+            {"error": f"corpo acima do limite de {limit} bytes para esta rota", "limit": limit}))
+        return
+
+    loop = asyncio.get_running_loop()
+    feeder = None
+    if more:
+        # o resto chega enquanto a view lê; o limite da rota fica com o LimitedRequest
+        queue = asyncio.Queue(ASGI_QUEUE_CHUNKS)
+        feeder = loop.create_task(pump(receive, queue))
+        body, length = QueueInput(loop, bytes(head), queue), declared
+    else:
+        body, length = io.BytesIO(head), len(head)
+    # todos os passos da requisição no mesmo Context: o stream_with_context do Flask
+    # entra e sai do contexto em passos diferentes (e talvez em threads diferentes)
+    ctx = contextvars.copy_context()
+    run = lambda fn, *args: loop.run_in_executor(executor(), ctx.run, fn, *args)
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None  # write() não é usado pelo Flask
+
+    result = None
+    try:
+        result = await run(lambda: flask_app(wsgi_environ(scope, body, length), start_response))
+        chunks = iter(result)
+        await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+        while True:
+            chunk = await run(next, chunks, None)
+            if chunk is None:
+                break
+            for i in range(0, len(chunk), ASGI_SEND_CHUNK):
+                await send({"type": "http.response.body", "body": chunk[i:i + ASGI_SEND_CHUNK], "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            await run(close)
+        if feeder is not None:
+            feeder.cancel()  # a view pode ter parado antes do fim do corpo (413, erro)
+        body.close()
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "http":
+        await http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    else:
+        raise RuntimeError(f"escopo ASGI não suportado: {scope['type']}")
@@ -0,0 +1,903 @@
+"""
+Benchmarks locais (não fazem parte do serviço).
+
+    python bench.py classify [--n 100000] [--category pizzaria]
+    python bench.py m0b [--competitors 1,10,50,100] [--findings 200] [--workers 2,4]
+    python bench.py columnar [--competitors 50] [--findings 200]
+    python bench.py boot [--workers 2]
+    python bench.py m2delta [--competitors 50] [--findings 200] [--steps 200]
+    python bench.py m2batch [--sizes 1,10,100,1000] [--competitors 50] [--findings 200]
+    python bench.py dedup [--sizes 1000,10000,100000] [--dup-ratio 0.4] [--threshold 0.8]
+    python bench.py upload [--sizes 10000,100000]
+    python bench.py respcache [--size 10000] [--competitors 10] [--reps 20]
+    python bench.py skeleton [--sizes 10,100,1000,10000] [--reps 20]
+    python bench.py wire [--size 10000] [--competitors 10] [--level 6] [--reps 5]
+    python bench.py slowclients [--clients 16] [--seconds 3] [--size 1000] [--probe-every 0.05]
+    python bench.py endpoints [--sizes 100,10000,100000] [--competitors 1,10,100]
+                              [--corpus pizzaria,generico] [--target client,gunicorn]
+                              [--reps 5] [--no-cache] [--out bench-results.json]
+
+'classify' compara o classify_snippet compilado com a varredura linear
+original (grupo a grupo) do pacote da categoria num corpus sintético e
+falha se algum resultado divergir. A capacidade do cache segue
+CLASSIFY_CACHE_SIZE.
+
+'m0b' mede run_m0_competidores por quantidade de competidores em cada
+backend (serial/thread/process) e número de workers, conferindo que a
+saída é idêntica à serial. O cache de classificação é desligado para que
+cada passada classifique de fato. Abaixo de M0B_PARALLEL_MIN competidores
+o caminho é serial em qualquer backend.
+
+'columnar' roda o pipeline completo e compara, por etapa tabular, bytes e
+tempo de serialização (conversão incluída) do formato em linhas vs colunar.
+
+'boot' sobe o gunicorn local (app:app, como no render.yaml) com e sem
+--preload e mede o tempo até o primeiro /health 200 e RSS/PSS por worker.
+
+'m2delta' aplica uma sequência aleatória de (des)aprovações, uma por vez,
+pelo run_m2_delta e, a cada passo, compara a grade com a M2 recalculada do
+zero sobre a M1 com os mesmos approved; falha se alguma divergir. Mede
+também o tempo de cada caminho (o da M2 completa inclui a comparação
+competitiva, que o delta reaproveita da grade anterior).
+
+'m2batch' monta um portfólio de marcas (variações de uma M1: atributos
+removidos, aprovações, sugestões e use_only_approved sorteados) contra o
+mesmo conjunto de competidores e mede, por tamanho de lote, marcas/s da
+M2 marca a marca (run_m2_diferenciais) e do lote (run_m2_batch). Falha se
+alguma marca do lote divergir da M2 individual ou se o caminho numpy não
+rodar (numpy ausente ou nenhum lote com M2_NUMPY_MIN marcas).
+
+'dedup' gera achados com quase-duplicatas injetadas (repostagens com
+hashtag, pontuação, caixa ou uma palavra trocada) e mede o dedup do M0 por
+tamanho: tempo por mil achados (deve ficar estável se o custo é quase
+linear) e quanto o corpus encolheu. No menor tamanho confere o agrupamento
+contra a comparação de todos os pares (força bruta) e falha se o LSH
+perder duplicatas.
+
+'upload' compara, no corpo do /m0-pesquisa, o get_json (corpo inteiro e
+depois o parse) com a leitura em fluxo do jsonstream normalizando cada
+achado: tempo e pico de memória (tracemalloc) até ter os achados
+normalizados, e confere que o resultado é o mesmo.
+
+'respcache' chama M2–M5 pelo test client com o mesmo corpo: a primeira
+chamada (calcula e guarda), as repetições (cache em memória) e as
+repetições com If-None-Match (304), com a latência média e os bytes de
+cada resposta.
+
+'skeleton' serializa a M4 e a M5 pelos dois caminhos: dicts montados
+pela etapa + dumps do provedor JSON do app, e os esqueletos pré-serializados
+(STAGE_ENCODERS). Mede o tempo por tamanho (itens) e falha se os bytes
+diferirem, inclusive com nomes de diferencial com acentos, aspas, barras,
+controles e valores que não são string.
+
+'wire' passa cada endpoint pelo test client e, para cada provedor JSON
+disponível (stdlib, orjson), mede o loads do corpo da requisição e o dumpb
+da resposta, e os bytes da resposta crua, em gzip e em deflate no nível
+--level (com o tempo de compressão). O /classify-stream é medido linha a
+linha.
+
+'slowclients' sobe o gunicorn local das duas formas — app:app (WSGI, threads
+do gunicorn, como no render.yaml) e asgi:app (UvicornWorker, views no executor
+do asgi.py com ASGI_THREADS=--threads) — e, em cada um, abre --clients
+conexões que mandam o corpo do /m0-pesquisa aos pedaços ao longo de
+--seconds, enquanto uma sonda faz /m3-decisao curtos em sequência. Informa o
+in-flight médio (soma das durações dos lentos / tempo total), o tempo total e
+o p50/p99 dos lentos e da sonda. Com o --size padrão o corpo fica abaixo de
+ASGI_BUFFER_BYTES (recebido inteiro antes da view). Em loopback o buffer do socket absorve boa
+parte do corpo, então a diferença aparece sobretudo na sonda: no WSGI ela
+espera atrás das threads presas lendo corpos lentos.
+
+'endpoints' gera corpora sintéticos (pizzaria e genérico) e passa cada
+endpoint pelo test client do Flask e/ou por um gunicorn local, medindo
+vazão, latência p50/p99 e pico de memória por etapa. O pico no client é o
+do tracemalloc numa passada extra (fora da medição de tempo); no gunicorn é
+o VmHWM dos workers. Os resultados vão também para um JSON (--out) para
+comparar rodadas.
+"""
+import argparse
+import asyncio
+import copy
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+import compression
+import dedup
+import jsonprovider
+import jsonstream
+from main import (COLUMNAR_FIELDS, M2_NUMPY_MIN, STAGE_ENCODERS, SUB_BENEFITS, apply_approvals, classify_snippet,
+                  classify_cache_stats, columnar, create_app, keyword_pack, m0_finding, reload_keywords,
+                  run_m0_competidores, run_m0_pesquisa, run_m1_beneficios, run_m2_batch, run_m2_delta, run_m2_diferenciais,
+                  run_m3_decisao, run_m4_detalhamento, run_m5_planejamento, run_pipeline)
+from main import np as numpy_or_none
+
+# vocabulário neutro (não contém palavras-chave) para compor os textos
+FILLER = ("pizza noite bairro cidade hoje sempre melhor ótimo gostoso queijo tomate "
+          "loja rua mesa fome fim de semana borda recheio calabresa mussarela "
+          "atendimento preço aberto até tarde").split()
+GENERIC_FILLER = ("loja produto cliente compra venda oferta horário endereço cidade "
+                  "atendimento preço equipe serviço novo hoje sempre melhor ótimo "
+                  "aberto fechado semana mês contato site telefone").split()
+
+# corpus → (vocabulário, chance de conter palavra-chave)
+CORPORA = {"pizzaria": (FILLER, 0.6), "generico": (GENERIC_FILLER, 0.3)}
+
+def _classify_reference(text, pack):
+    # implementação original (varredura grupo a grupo), mantida só para conferência
+    t = (text or "").lower()
+    for keys, tag in pack.table:
+        if any(k in t for k in keys):
+            return tag
+    return pack.fallback
+
+def make_corpus(n, seed=42, hit_ratio=None, kind="pizzaria"):
+    rnd = random.Random(seed)
+    filler, default_ratio = CORPORA[kind]
+    hit_ratio = default_ratio if hit_ratio is None else hit_ratio
+    keywords = [k for keys, _ in keyword_pack(kind).table for k in keys]
+    corpus = []
+    for _ in range(n):
+        words = [rnd.choice(filler) for _ in range(rnd.randint(4, 40))]
+        p = hit_ratio
+        while rnd.random() < p:
+            k = rnd.choice(keywords)
+            words.insert(rnd.randrange(len(words) + 1), k.upper() if rnd.random() < 0.1 else k)
+            p /= 2
+        corpus.append(" ".join(words))
+    return corpus
+
+def _timed(fn, corpus):
+    t0 = time.perf_counter()
+    out = [fn(x) for x in corpus]
+    return out, time.perf_counter() - t0
+
+def bench_classify(args):
+    pack = keyword_pack(args.category)
+    corpus = make_corpus(args.n, kind=args.category if args.category in CORPORA else "pizzaria")
+    ref, t_ref = _timed(lambda t: _classify_reference(t, pack), corpus)
+    classify = lambda t: classify_snippet(t, args.category)
+    new, t_new = _timed(classify, corpus)
+    # textos recorrentes: um subconjunto que cabe no cache, já aquecido
+    hot = corpus[: max(1, classify_cache_stats(args.category)["maxsize"] // 2)]
+    _timed(classify, hot)
+    _, t_warm = _timed(classify, hot)
+    diverged = sum(1 for a, b in zip(ref, new) if a != b)
+    print(f"pacote: {pack.name} ({len(pack.matcher)} palavras compiladas)  corpus: {len(corpus)} snippets")
+    print(f"referência (linear): {t_ref:.3f}s  ({len(corpus) / t_ref:,.0f}/s)")
+    print(f"classify_snippet:    {t_new:.3f}s  ({len(corpus) / t_new:,.0f}/s)  x{t_ref / t_new:.2f}")
+    print(f"recorrentes (cache): {t_warm:.3f}s  ({len(hot) / t_warm:,.0f}/s)  x{t_ref / len(corpus) * len(hot) / t_warm:.2f}")
+    print(f"cache: {classify_cache_stats(args.category)}")
+    print(f"divergências: {diverged}")
+    return 1 if diverged else 0
+
+def make_competitors(n_competitors, n_findings, seed=42, kind="pizzaria"):
+    rnd = random.Random(seed)
+    texts = make_corpus(n_findings * 4, seed=seed, kind=kind)
+    sources = ["website", "instagram", "facebook", "maps", "menu"]
+    return [{"competitor": f"Concorrente {i}",
+             "findings": [{"text": t, "source_type": rnd.choice(sources), "source_name": "bench",
+                           "url": f"https://example.com/{i}", "captured_at": "2025-10-03"}
+                          for t in rnd.sample(texts, n_findings)]}
+            for i in range(n_competitors)]
+
+def _ints(csv):
+    return [int(x) for x in csv.split(",") if x]
+
+def bench_m0b(args):
+    os.environ["CLASSIFY_CACHE_SIZE"] = "0"  # vale também para os processos do pool
+    reload_keywords(cache_size=0)
+    cpus = os.cpu_count() or 1
+    print(f"cpus: {cpus}  findings/competidor: {args.findings}")
+    print(f"{'competidores':>12} {'backend':>8} {'workers':>7} {'tempo':>8} {'x serial':>8}")
+    failed = 0
+    for n in _ints(args.competitors):
+        body = {"brand": "bench", "category": "pizzaria",
+                "competitors_findings": make_competitors(n, args.findings)}
+        t0 = time.perf_counter()
+        ref = run_m0_competidores(body, backend="serial")
+        t_serial = time.perf_counter() - t0
+        print(f"{n:>12} {'serial':>8} {1:>7} {t_serial:>7.3f}s {1:>8.2f}")
+        for backend in ("thread", "process"):
+            for w in _ints(args.workers):
+                run_m0_competidores(body, backend=backend, workers=w)  # aquece o pool
+                t0 = time.perf_counter()
+                out = run_m0_competidores(body, backend=backend, workers=w)
+                dt = time.perf_counter() - t0
+                same = out == ref
+                failed += not same
+                print(f"{n:>12} {backend:>8} {w:>7} {dt:>7.3f}s {t_serial / dt:>8.2f}"
+                      + ("" if same else "  DIVERGE"))
+    return 1 if failed else 0
+
+def make_pipeline_body(n_competitors, n_findings, seed=42):
+    rnd = random.Random(seed)
+    competitors = make_competitors(n_competitors, n_findings, seed=seed)
+    findings = competitors[0]["findings"] if competitors else []
+    body = {"brand": "bench", "category": "pizzaria", "scope": "bench",
+            "findings": findings, "competitors_findings": competitors[1:],
+            "suggestions": [{"text": t, "from": "category_pattern"} for t in make_corpus(20, seed=seed + 1)]}
+    m1 = run_pipeline({**body, "stages": ["m1"]})["stages"]["m1"]
+    body["approved"] = [{"pillar": a["pillar"], "sub_benefit": a["sub_benefit"]}
+                        for a in m1["attributes"] if rnd.random() < 0.5]
+    return body
+
+def bench_columnar(args):
+    app = create_app(warmup=False)
+    body = make_pipeline_body(args.competitors + 1, args.findings)
+    stages = run_pipeline(body)["stages"]
+    print(f"competidores: {args.competitors}  findings/competidor: {args.findings}")
+    print(f"{'etapa':>5} {'campo':>11} {'linhas (B)':>11} {'colunar (B)':>11} {'redução':>8} "
+          f"{'t linhas':>9} {'t colunar':>9} {'resposta inteira':>18}")
+    reps = max(1, args.reps)
+    for stage, field in COLUMNAR_FIELDS.items():
+        out = stages[stage]
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            rows = app.json.dumps(out[field])
+        t_rows = (time.perf_counter() - t0) / reps
+        copies = [copy.deepcopy(out) for _ in range(reps)]
+        t0 = time.perf_counter()
+        for c in copies:
+            cols = app.json.dumps(columnar(c, stage)[field])
+        t_cols = (time.perf_counter() - t0) / reps
+        whole_rows, whole_cols = len(app.json.dumps(out)), len(app.json.dumps(copies[0]))
+        print(f"{stage:>5} {field:>11} {len(rows):>11,} {len(cols):>11,} {1 - len(cols) / len(rows):>8.1%} "
+              f"{t_rows * 1000:>7.2f}ms {t_cols * 1000:>7.2f}ms {1 - whole_cols / whole_rows:>18.1%}")
+    return 0
+
+def bench_m2delta(args):
+    rnd = random.Random(args.seed)
+    body = make_pipeline_body(args.competitors + 1, args.findings, seed=args.seed)
+    stages = run_pipeline({**body, "stages": ["m0b", "m1"], "approved": []})["stages"]
+    m1, m0b = stages["m1"], stages["m0b"]
+    keys = [(a["pillar"], a["sub_benefit"]) for a in m1["attributes"]]
+    if not keys:
+        print("M1 sem atributos; nada a aprovar")
+        return 1
+    only = bool(args.only_approved)
+    prev = run_m2_diferenciais({"brand": "bench", "from_m1": m1, "from_competitors": m0b, "use_only_approved": only})
+    t_delta = t_full = 0.0
+    failed = 0
+    for step in range(args.steps):
+        pillar, sub = rnd.choice(keys)
+        approved = rnd.random() < 0.6
+        if rnd.random() < 0.05:
+            only = not only
+        t0 = time.perf_counter()
+        prev, _ = run_m2_delta({"brand": "bench", "from_m2": prev, "use_only_approved": only,
+                                "changes": [{"pillar": pillar, "sub_benefit": sub, "approved": approved}]})
+        t_delta += time.perf_counter() - t0
+        for a in m1["attributes"]:
+            if (a["pillar"], a["sub_benefit"]) == (pillar, sub):
+                a["approved"] = approved
+        t0 = time.perf_counter()
+        full = run_m2_diferenciais({"brand": "bench", "from_m1": m1, "from_competitors": m0b, "use_only_approved": only})
+        t_full += time.perf_counter() - t0
+        if prev != full:
+            failed += 1
+            print(f"passo {step}: DIVERGE ({pillar}/{sub} approved={approved} only={only})")
+    n = max(1, args.steps)
+    print(f"competidores: {args.competitors}  findings/competidor: {args.findings}  passos: {args.steps}")
+    print(f"M2 completa: {t_full / n * 1000:.3f}ms/passo")
+    print(f"delta:       {t_delta / n * 1000:.3f}ms/passo  x{t_full / max(t_delta, 1e-9):.1f}")
+    print(f"divergências: {failed}")
+    return 1 if failed else 0
+
+def make_portfolio(m1, n, seed=42):
+    """n variações de uma M1 (como marcas diferentes da mesma categoria)."""
+    rnd = random.Random(seed)
+    brands = []
+    for k in range(n):
+        attrs = [{**a, "approved": rnd.random() < 0.5} for a in m1["attributes"] if rnd.random() < 0.8]
+        suggested = [{"pillar": p, "sub_benefit": s} for p, s in rnd.sample(SUB_BENEFITS, rnd.randint(0, 6))]
+        brands.append({"brand": f"marca-{k}", "use_only_approved": rnd.random() < 0.3,
+                       "from_m1": {**m1, "attributes": attrs, "suggested": suggested}})
+    return brands
+
+def bench_m2batch(args):
+    stages = run_pipeline({**make_pipeline_body(args.competitors + 1, args.findings, seed=args.seed),
+                           "stages": ["m0b", "m1"]})["stages"]
+    sizes = [int(x) for x in args.sizes.split(",")]
+    portfolio = make_portfolio(stages["m1"], max(sizes), seed=args.seed)
+    numpy_path = numpy_or_none is not None and max(sizes) >= M2_NUMPY_MIN
+    print(f"competidores: {args.competitors}  findings/competidor: {args.findings}  numpy: "
+          + (f"sim (lotes de {M2_NUMPY_MIN}+ marcas)" if numpy_path else "NÃO USADO"))
+    print(f"{'marcas':>7} {'individual (marcas/s)':>22} {'lote (marcas/s)':>16} {'x':>6}")
+    failed = 0
+    for n in sizes:
+        brands = portfolio[:n]
+        reps = max(1, 2000 // n)
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            single = [run_m2_diferenciais({**e, "from_competitors": stages["m0b"]}) for e in brands]
+        t_single = (time.perf_counter() - t0) / reps
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            batch = run_m2_batch({"brands": brands, "from_competitors": stages["m0b"]})
+        t_batch = (time.perf_counter() - t0) / reps
+        bad = sum(a != b for a, b in zip(single, batch["brands"]))
+        failed += bad
+        print(f"{n:>7} {n / t_single:>22,.0f} {n / t_batch:>16,.0f} {t_single / t_batch:>6.2f}"
+              + (f"  DIVERGE em {bad} marcas" if bad else ""))
+    if not numpy_path:
+        print("falha: o caminho numpy não rodou (numpy não instalado ou nenhum lote com "
+              f"{M2_NUMPY_MIN}+ marcas)")
+    return 1 if failed or not numpy_path else 0
+
+SKELETON_NAMES = ["", "ação/coração", 'aspas "duplas"', "barra \\ e /", "tab\tquebra\n", "emoji 🍕", "\u2028"]
+
+def make_m4_m5_inputs(n, seed=42):
+    """from_m3 e from_m4 com n itens; alguns nomes difíceis de escapar e valores que não são string."""
+    rnd = random.Random(seed)
+    decisions, detailed = [], []
+    for i in range(n):
+        pillar, sub = rnd.choice(SUB_BENEFITS)
+        if i % 10 == 0:
+            pillar, sub = rnd.choice(SKELETON_NAMES), rnd.choice(SKELETON_NAMES + [None, 7])
+        decisions.append({"pillar": pillar, "sub_benefit": sub})
+        detailed.append({"differential": f"{pillar}/{sub}" if i % 13 else rnd.choice([None, 3.5, ["x"], sub])})
+    return {"brand": "bench é", "from_m3": {"decisions": decisions}}, {"brand": "bench é", "from_m4": {"detailed": detailed}}
+
+def bench_skeleton(args):
+    app = create_app(warmup=False)
+    ids = {"run_id": "r" * 32, "stage_id": "s" * 32}
+    stages = (("m4", run_m4_detalhamento, 0), ("m5", run_m5_planejamento, 1))
+    print(f"{'etapa':>5} {'itens':>7} {'dicts+dumps':>12} {'esqueleto':>10} {'x':>6} {'bytes':>10}")
+    failed = 0
+    with app.app_context():
+        for n in (int(x) for x in args.sizes.split(",")):
+            bodies = make_m4_m5_inputs(n)
+            reps = max(1, args.reps * 1000 // max(n, 1000))
+            for stage, fn, k in stages:
+                b = bodies[k]
+                t0 = time.perf_counter()
+                for _ in range(reps):
+                    ref = app.json.dumps({**fn(b), **ids}).encode()
+                t_ref = (time.perf_counter() - t0) / reps
+                t0 = time.perf_counter()
+                for _ in range(reps):
+                    fast = STAGE_ENCODERS[stage](b, ids)
+                t_fast = (time.perf_counter() - t0) / reps
+                ok = ref == fast
+                failed += not ok
+                print(f"{stage:>5} {n:>7} {t_ref * 1000:>10.2f}ms {t_fast * 1000:>8.2f}ms {t_ref / t_fast:>6.1f} "
+                      f"{len(fast):>10,}" + ("" if ok else "  BYTES DIFEREM"))
+    return 1 if failed else 0
+
+def make_dup_findings(n, dup_ratio=0.4, seed=42, kind="pizzaria"):
+    """Achados em que ~dup_ratio são repostagens levemente alteradas de um anterior."""
+    rnd = random.Random(seed)
+    texts = make_corpus(n, seed=seed, kind=kind)
+    sources = ["website", "instagram", "facebook", "maps", "menu"]
+    filler = CORPORA[kind][0]
+    out = []
+    for i, text in enumerate(texts):
+        if out and rnd.random() < dup_ratio:
+            words = rnd.choice(out)["text"].split()
+            edit = rnd.randrange(4)
+            if edit == 0:
+                words.append(rnd.choice(["#promo", "#pizza", "#delivery"]))
+            elif edit == 1:
+                words[-1] += rnd.choice(["!", "!!", "."])
+            elif edit == 2:
+                words = [w.upper() if rnd.random() < 0.3 else w for w in words]
+            else:
+                words[rnd.randrange(len(words))] = rnd.choice(filler)
+            text = " ".join(words)
+        out.append({"text": text, "source_type": rnd.choice(sources), "source_name": "bench",
+                    "url": f"https://example.com/{i}", "captured_at": "2025-10-03"})
+    return out
+
+def _brute_groups(texts, threshold):
+    reps, count = [], 0
+    for t in texts:
+        sh = dedup.shingles(dedup.tokens(t))
+        if not any(dedup.jaccard(sh, r) >= threshold for r in reps):
+            reps.append(sh)
+    return len(reps)
+
+def bench_dedup(args):
+    sizes = _ints(args.sizes)
+    print(f"limiar: {args.threshold}  bandas x linhas: {dedup.bands(args.threshold)}  repostagens: {args.dup_ratio:.0%}")
+    print(f"{'achados':>9} {'saída':>9} {'redução':>8} {'tempo':>8} {'ms/1k':>7}")
+    failed = 0
+    for n in sizes:
+        findings = make_dup_findings(n, args.dup_ratio)
+        body = {"brand": "bench", "findings": findings, "dedup": True, "dedup_threshold": args.threshold}
+        run_m0_pesquisa({**body, "dedup": False})  # aquece
+        t0 = time.perf_counter()
+        plain = run_m0_pesquisa({**body, "dedup": False})
+        t_plain = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        out = run_m0_pesquisa(body)
+        dt = time.perf_counter() - t0 - t_plain
+        rep = out["dedup"]
+        print(f"{n:>9,} {rep['output']:>9,} {rep['reduction']:>8.1%} {dt:>7.3f}s {dt / n * 1e6:>7.2f}")
+        if n == min(sizes) and n <= 20_000:
+            brute = _brute_groups([f["text"] for f in plain["evidence"]], args.threshold)
+            missed = rep["output"] - brute
+            failed += missed > 0
+            print(f"{'':>9} força bruta: {brute:,} grupos  duplicatas perdidas pelo LSH: {max(0, missed)}")
+    return 1 if failed else 0
+
+def _upload_buffered(body):
+    data = io.BytesIO(body).read()  # o get_json lê o corpo inteiro antes do parse
+    return [n for n in map(m0_finding, json.loads(data)["findings"]) if n is not None]
+
+def _upload_streamed(body):
+    return jsonstream.read_object(io.BytesIO(body), {"findings": m0_finding})["findings"]
+
+def bench_upload(args):
+    print(f"{'achados':>9} {'corpo MB':>9} {'modo':>9} {'tempo':>8} {'pico MB':>8}")
+    failed = 0
+    for n in _ints(args.sizes):
+        findings = make_dup_findings(n, 0.0)
+        for f in findings:  # campos extras que a normalização descarta
+            f["raw_html"] = "<div>" + f["text"] + "</div>"
+        body = json.dumps({"brand": "bench", "findings": findings}).encode()
+        del findings
+        results = []
+        for mode, fn in (("get_json", _upload_buffered), ("fluxo", _upload_streamed)):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            out = fn(body)
+            dt = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append(out)
+            print(f"{n:>9,} {len(body) / 2**20:>9.1f} {mode:>9} {dt:>7.3f}s {peak / 2**20:>8.1f}")
+        failed += results[0] != results[1]
+    print(f"divergências: {failed}")
+    return 1 if failed else 0
+
+def bench_respcache(args):
+    app = create_app(warmup=False)
+    c = app.test_client()
+    bodies = endpoint_bodies("pizzaria", args.size, args.competitors)
+    reps = max(1, args.reps)
+    print(f"achados: {args.size}  competidores: {args.competitors}")
+    print(f"{'endpoint':>17} {'1ª ms':>9} {'cache ms':>9} {'304 ms':>9} {'bytes':>11} {'bytes 304':>9}")
+    failed = 0
+    for path in ("/m2-diferenciais", "/m3-decisao", "/m4-detalhamento", "/m5-planejamento"):
+        data, ctype, _ = bodies[path]
+        post = lambda headers=None: c.post(path, data=data, content_type=ctype, headers=headers or {})
+        t0 = time.perf_counter()
+        first = post()
+        t_first = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            again = post()
+        t_hit = (time.perf_counter() - t0) / reps
+        etag = first.headers["ETag"]
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            nm = post({"If-None-Match": etag})
+        t_304 = (time.perf_counter() - t0) / reps
+        ok = again.data == first.data and nm.status_code == 304
+        failed += not ok
+        print(f"{path:>17} {t_first * 1000:>9.2f} {t_hit * 1000:>9.2f} {t_304 * 1000:>9.2f} "
+              f"{len(first.data):>11,} {len(nm.data):>9}" + ("" if ok else "  FALHOU"))
+    print(f"cache: {c.get('/stats').get_json()['response_cache']}")
+    return 1 if failed else 0
+
+def _repeat(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        out = fn()
+    return out, (time.perf_counter() - t0) / reps
+
+def bench_wire(args):
+    app = create_app(warmup=False)
+    c = app.test_client()
+    bodies = endpoint_bodies("pizzaria", args.size, args.competitors)
+    providers = {name: cls(app) for name, cls in jsonprovider.PROVIDERS.items()
+                 if name == "stdlib" or jsonprovider.orjson is not None}
+    reps = max(1, args.reps)
+    print(f"achados: {args.size}  competidores: {args.competitors}  nível: {args.level}  "
+          f"provedores: {', '.join(providers)}  (app: {type(app.json).__name__})")
+    print(f"{'endpoint':>17} {'provedor':>8} {'loads ms':>9} {'dumps ms':>9} {'bytes':>11} "
+          f"{'gzip':>9} {'deflate':>9} {'gzip ms':>8}")
+    for path, (data, ctype, _) in bodies.items():
+        r = c.post(path, data=data, content_type=ctype)
+        ndjson = ctype == "application/x-ndjson"
+        for name, p in providers.items():
+            if ndjson:
+                lines = data.splitlines()
+                _, t_loads = _repeat(lambda: [p.loads(line) for line in lines], reps)
+                rows = [p.loads(line) for line in r.data.splitlines()]
+                raw, t_dumps = _repeat(lambda: b"\n".join(map(p.dumpb, rows)) + b"\n", reps)
+            else:
+                _, t_loads = _repeat(lambda: p.loads(data), reps)
+                out = p.loads(r.data)
+                raw, t_dumps = _repeat(lambda: p.dumpb(out), reps)
+            gz, t_gz = _repeat(lambda: compression.compress(raw, "gzip", args.level), reps)
+            zl = compression.compress(raw, "deflate", args.level)
+            print(f"{path:>17} {name:>8} {t_loads * 1000:>9.2f} {t_dumps * 1000:>9.2f} {len(raw):>11,} "
+                  f"{len(gz):>9,} {len(zl):>9,} {t_gz * 1000:>8.2f}")
+    return 0
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_http(url, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def _mem_kb(pid):
+    """(RSS, PSS) em kB a partir do /proc (Linux)."""
+    out = {}
+    for path, key in ((f"/proc/{pid}/status", "VmRSS:"), (f"/proc/{pid}/smaps_rollup", "Pss:")):
+        try:
+            with open(path) as f:
+                out[key] = next(int(l.split()[1]) for l in f if l.startswith(key))
+        except (OSError, StopIteration):
+            out[key] = 0
+    return out["VmRSS:"], out["Pss:"]
+
+def start_gunicorn(port, workers=2, threads=2, preload=True, target="app:app", extra=()):
+    cmd = [sys.executable, "-m", "gunicorn", target, "--bind", f"127.0.0.1:{port}",
+           "--workers", str(workers), "--threads", str(threads), "--timeout", "120", *extra]
+    if preload:
+        cmd.append("--preload")
+    return subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def bench_boot(args):
+    print(f"{'modo':>10} {'boot':>8} {'worker':>7} {'RSS kB':>9} {'PSS kB':>9}")
+    for preload in (False, True):
+        port = _free_port()
+        t0 = time.perf_counter()
+        proc = start_gunicorn(port, workers=args.workers, preload=preload)
+        try:
+            if not _wait_http(f"http://127.0.0.1:{port}/health"):
+                print("gunicorn não respondeu")
+                return 1
+            boot = time.perf_counter() - t0
+            while len(_children(proc.pid)) < args.workers and time.perf_counter() - t0 < 30:
+                time.sleep(0.05)
+            time.sleep(0.5)  # deixa todos os workers terminarem o boot
+            mode = "preload" if preload else "sem"
+            for i, pid in enumerate(_children(proc.pid)):
+                rss, pss = _mem_kb(pid)
+                print(f"{mode:>10} {boot:>7.2f}s {i:>7} {rss:>9,} {pss:>9,}")
+        finally:
+            proc.terminate()
+            proc.wait(10)
+    return 0
+
+async def _raw_post(port, path, data, ctype, seconds=0.0, pieces=1):
+    """POST em socket cru, com o corpo em `pieces` pedaços ao longo de `seconds`; (status, duração)."""
+    t0 = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: {ctype}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode())
+        step = -(-len(data) // pieces)
+        for i in range(0, len(data), step):
+            writer.write(data[i:i + step])
+            await writer.drain()
+            if seconds:
+                await asyncio.sleep(seconds / pieces)
+        status = await reader.readline()
+        await reader.read()  # Connection: close → até o EOF
+        return int(status.split()[1]), time.perf_counter() - t0
+    finally:
+        writer.close()
+
+async def _slow_round(port, slow, probe, clients, seconds, probe_every):
+    done = asyncio.Event()
+    probes = []
+
+    async def prober():
+        while not done.is_set():
+            probes.append(await _raw_post(port, *probe))
+            await asyncio.sleep(probe_every)
+
+    t0 = time.perf_counter()
+    task = asyncio.create_task(prober())
+    slows = await asyncio.gather(*(_raw_post(port, *slow, seconds=seconds, pieces=30) for _ in range(clients)))
+    wall = time.perf_counter() - t0
+    done.set()
+    await task
+    return slows, probes, wall
+
+def bench_slowclients(args):
+    bodies = endpoint_bodies("pizzaria", args.size, 1)
+    slow, probe = ("/m0-pesquisa", *bodies["/m0-pesquisa"][:2]), ("/m3-decisao", *bodies["/m3-decisao"][:2])
+    os.environ["ASGI_THREADS"] = str(args.threads)  # mesma concorrência de CPU por worker nos dois modos
+    modes = {"wsgi": dict(target="app:app"),
+             "asgi": dict(target="asgi:app", extra=("-k", "uvicorn.workers.UvicornWorker"))}
+    print(f"{'modo':>5} {'lentos':>6} {'in-flight':>9} {'total s':>8} {'lento p50':>10} {'lento p99':>10} "
+          f"{'sondas':>6} {'sonda p50':>10} {'sonda p99':>10} {'erros':>5}")
+    for name, opts in modes.items():
+        port = _free_port()
+        proc = start_gunicorn(port, workers=args.workers, threads=args.threads, **opts)
+        try:
+            if not _wait_http(f"http://127.0.0.1:{port}/health", 60):
+                print(f"{name}: gunicorn não respondeu")
+                return 1
+            for path, data, ctype in (slow, probe):  # aquecimento
+                asyncio.run(_raw_post(port, path, data, ctype))
+            slows, probes, wall = asyncio.run(
+                _slow_round(port, slow, probe, args.clients, args.seconds, args.probe_every))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        errors = sum(status != 200 for status, _ in slows + probes)
+        ls, lp = [t for _, t in slows], [t for _, t in probes]
+        print(f"{name:>5} {len(slows):>6} {sum(ls) / wall:>9.1f} {wall:>8.2f} {_pct(ls, 50) * 1000:>10.0f} "
+              f"{_pct(ls, 99) * 1000:>10.0f} {len(lp):>6} {_pct(lp, 50) * 1000:>10.1f} "
+              f"{_pct(lp, 99) * 1000:>10.1f} {errors:>5}")
+    return 0
+
+def _findings(texts, rnd, tag):
+    sources = ["website", "instagram", "facebook", "maps", "menu", "news"]
+    return [{"text": t, "source_type": rnd.choice(sources), "source_name": tag,
+             "url": f"https://example.com/{tag}/{i}", "captured_at": "2025-10-03"}
+            for i, t in enumerate(texts)]
+
+def endpoint_bodies(kind, size, n_competitors, seed=42):
+    """
+    Corpo (bytes, content-type, itens) de cada endpoint para um corpus de `size`
+    achados da marca e `size` achados divididos entre os competidores. As etapas
+    a jusante recebem a saída real da etapa anterior.
+    """
+    rnd = random.Random(seed)
+    brand = {"brand": "bench", "category": kind, "scope": "bench"}
+    findings = _findings(make_corpus(size, seed=seed, kind=kind), rnd, "marca")
+    comp_texts = make_corpus(size, seed=seed + 1, kind=kind)
+    per = max(1, size // n_competitors)
+    competitors = [{"competitor": f"Concorrente {i}",
+                    "findings": _findings(comp_texts[i * per:(i + 1) * per], rnd, f"c{i}")}
+                   for i in range(n_competitors)]
+    suggestions = [{"text": t, "from": "category_pattern"} for t in make_corpus(20, seed=seed + 2, kind=kind)]
+
+    m0 = run_m0_pesquisa({**brand, "findings": findings})
+    m0b = run_m0_competidores({**brand, "competitors_findings": competitors})
+    m1 = run_m1_beneficios({**brand, "evidence": m0["evidence"], "suggestions": suggestions})
+    approved = [{"pillar": p, "sub_benefit": sub} for p, sub in
+                {(a["pillar"], a["sub_benefit"]) for a in m1["attributes"]} if rnd.random() < 0.5]
+    apply_approvals(m1, approved)
+    m2 = run_m2_diferenciais({**brand, "from_m1": m1, "from_competitors": m0b})
+    m3 = run_m3_decisao({**brand, "from_m2": m2})
+    m4 = run_m4_detalhamento({**brand, "from_m3": m3})
+
+    dumps = lambda o: json.dumps(o).encode()
+    js = "application/json"
+    return {
+        "/m0-pesquisa": (dumps({**brand, "findings": findings}), js, size),
+        "/m0-competidores": (dumps({**brand, "competitors_findings": competitors}), js, per * n_competitors),
+        "/m1-beneficios": (dumps({**brand, "evidence": m0["evidence"], "suggestions": suggestions}), js, size),
+        "/classify-stream": ("".join(json.dumps(f) + "\n" for f in findings).encode(), "application/x-ndjson", size),
+        "/m2-diferenciais": (dumps({**brand, "from_m1": m1, "from_competitors": m0b}), js, len(m1["attributes"])),
+        "/m3-decisao": (dumps({**brand, "from_m2": m2}), js, len(m2["grid"])),
+        "/m4-detalhamento": (dumps({**brand, "from_m3": m3}), js, len(m3["decisions"])),
+        "/m5-planejamento": (dumps({**brand, "from_m4": m4}), js, len(m4["detailed"])),
+        "/pipeline": (dumps({**brand, "findings": findings, "competitors_findings": competitors,
+                             "suggestions": suggestions, "approved": approved}), js, size + per * n_competitors),
+    }
+
+def _pct(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def _summary(latencies, items):
+    total = sum(latencies)
+    return {"p50_ms": round(_pct(latencies, 50) * 1000, 3), "p99_ms": round(_pct(latencies, 99) * 1000, 3),
+            "mean_ms": round(total / len(latencies) * 1000, 3),
+            "rps": round(len(latencies) / total, 2), "items_per_s": round(items * len(latencies) / total, 1)}
+
+class ClientTarget:
+    name = "client"
+
+    def __init__(self, args):
+        self.client = create_app(warmup=False).test_client()
+
+    def post(self, path, data, ctype):
+        r = self.client.post(path, data=data, content_type=ctype)
+        return r.status_code, len(r.get_data())
+
+    def peak_kb(self, path, data, ctype):
+        tracemalloc.start()
+        try:
+            self.post(path, data, ctype)
+            return tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+
+    def close(self):
+        pass
+
+class GunicornTarget:
+    name = "gunicorn"
+
+    def __init__(self, args):
+        self.port = _free_port()
+        self.proc = start_gunicorn(self.port, workers=args.workers, threads=args.threads)
+        if not _wait_http(f"http://127.0.0.1:{self.port}/health"):
+            self.close()
+            raise RuntimeError("gunicorn não respondeu")
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=600)
+
+    def post(self, path, data, ctype):
+        self.conn.request("POST", path, body=data, headers={"Content-Type": ctype})
+        r = self.conn.getresponse()
+        return r.status, len(r.read())
+
+    def peak_kb(self, path, data, ctype):
+        # VmHWM é o pico de RSS desde o boot: cresce por etapa, não zera
+        peaks = []
+        for pid in _children(self.proc.pid):
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    peaks.append(next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")))
+            except (OSError, StopIteration):
+                pass
+        return max(peaks, default=0)
+
+    def close(self):
+        self.proc.terminate()
+        self.proc.wait(10)
+
+TARGETS = {"client": ClientTarget, "gunicorn": GunicornTarget}
+
+def bench_endpoints(args):
+    # os corpos grandes (M2 com 100k atributos inline) passam do limite padrão; vale também para o gunicorn
+    os.environ.setdefault("MAX_BODY_BYTES", "1GB")
+    if args.no_cache:
+        os.environ["CLASSIFY_CACHE_SIZE"] = "0"  # vale também para o gunicorn
+        reload_keywords(cache_size=0)
+    results = []
+    header = (f"{'alvo':>8} {'corpus':>8} {'tamanho':>8} {'comp':>4} {'endpoint':>17} "
+              f"{'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'itens/s':>10} {'pico kB':>9}")
+    print(header)
+    for kind in args.corpus.split(","):
+        for size in _ints(args.sizes):
+            for n_comp in _ints(args.competitors):
+                bodies = endpoint_bodies(kind, size, n_comp)
+                for target_name in args.target.split(","):
+                    target = TARGETS[target_name](args)
+                    try:
+                        for path, (data, ctype, items) in bodies.items():
+                            status, resp_bytes = target.post(path, data, ctype)  # aquecimento
+                            if status != 200:
+                                print(f"{path}: HTTP {status}")
+                                return 1
+                            lat = []
+                            for _ in range(args.reps):
+                                t0 = time.perf_counter()
+                                target.post(path, data, ctype)
+                                lat.append(time.perf_counter() - t0)
+                            row = {"target": target.name, "corpus": kind, "size": size,
+                                   "competitors": n_comp, "endpoint": path, "reps": args.reps,
+                                   "items": items, "req_bytes": len(data), "resp_bytes": resp_bytes,
+                                   **_summary(lat, items),
+                                   "peak_mem_kb": target.peak_kb(path, data, ctype)}
+                            results.append(row)
+                            print(f"{row['target']:>8} {kind:>8} {size:>8} {n_comp:>4} {path:>17} "
+                                  f"{row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['rps']:>8.1f} "
+                                  f"{row['items_per_s']:>10,.0f} {row['peak_mem_kb']:>9,}")
+                    finally:
+                        target.close()
+    if args.out:
+        meta = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+                "platform": platform.platform(), "cpus": os.cpu_count(), "git_rev": _git_rev(),
+                "classify_cache_size": int(os.environ.get("CLASSIFY_CACHE_SIZE", "20000")),
+                "args": {k: v for k, v in vars(args).items() if k != "fn"}}
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=1, ensure_ascii=False)
+        print(f"resultados em {args.out}")
+    return 0
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("classify")
+    c.add_argument("--n", type=int, default=100_000)
+    c.add_argument("--category", default="pizzaria")
+    c.set_defaults(fn=bench_classify)
+    c = sub.add_parser("m0b")
+    c.add_argument("--competitors", default="1,10,50,100")
+    c.add_argument("--findings", type=int, default=200)
+    c.add_argument("--workers", default=",".join(map(str, sorted({2, os.cpu_count() or 1} - {1}))))
+    c.set_defaults(fn=bench_m0b)
+    c = sub.add_parser("columnar")
+    c.add_argument("--competitors", type=int, default=50)
+    c.add_argument("--findings", type=int, default=200)
+    c.add_argument("--reps", type=int, default=20)
+    c.set_defaults(fn=bench_columnar)
+    c = sub.add_parser("m2delta")
+    c.add_argument("--competitors", type=int, default=50)
+    c.add_argument("--findings", type=int, default=200)
+    c.add_argument("--steps", type=int, default=200)
+    c.add_argument("--seed", type=int, default=42)
+    c.add_argument("--only-approved", action="store_true")
+    c.set_defaults(fn=bench_m2delta)
+    c = sub.add_parser("m2batch")
+    c.add_argument("--sizes", default="1,10,100,1000")
+    c.add_argument("--competitors", type=int, default=50)
+    c.add_argument("--findings", type=int, default=200)
+    c.add_argument("--seed", type=int, default=42)
+    c.set_defaults(fn=bench_m2batch)
+    c = sub.add_parser("dedup")
+    c.add_argument("--sizes", default="1000,10000,100000")
+    c.add_argument("--dup-ratio", type=float, default=0.4)
+    c.add_argument("--threshold", type=float, default=0.8)
+    c.set_defaults(fn=bench_dedup)
+    c = sub.add_parser("upload")
+    c.add_argument("--sizes", default="10000,100000")
+    c.set_defaults(fn=bench_upload)
+    c = sub.add_parser("respcache")
+    c.add_argument("--size", type=int, default=10_000)
+    c.add_argument("--competitors", type=int, default=10)
+    c.add_argument("--reps", type=int, default=20)
+    c.set_defaults(fn=bench_respcache)
+    c = sub.add_parser("skeleton")
+    c.add_argument("--sizes", default="10,100,1000,10000")
+    c.add_argument("--reps", type=int, default=20)
+    c.set_defaults(fn=bench_skeleton)
+    c = sub.add_parser("wire")
+    c.add_argument("--size", type=int, default=10_000)
+    c.add_argument("--competitors", type=int, default=10)
+    c.add_argument("--level", type=int, default=6)
+    c.add_argument("--reps", type=int, default=5)
+    c.set_defaults(fn=bench_wire)
+    c = sub.add_parser("boot")
+    c.add_argument("--workers", type=int, default=2)
+    c.set_defaults(fn=bench_boot)
+    c = sub.add_parser("slowclients")
+    c.add_argument("--clients", type=int, default=16)
+    c.add_argument("--seconds", type=float, default=3.0)
+    c.add_argument("--size", type=int, default=1000)
+    c.add_argument("--probe-every", type=float, default=0.05)
+    c.add_argument("--workers", type=int, default=2)
+    c.add_argument("--threads", type=int, default=2)
+    c.set_defaults(fn=bench_slowclients)
+    c = sub.add_parser("endpoints")
+    c.add_argument("--sizes", default="100,10000,100000")
+    c.add_argument("--competitors", default="1,10,100")
+    c.add_argument("--corpus", default="pizzaria,generico")
+    c.add_argument("--target", default="client,gunicorn")
+    c.add_argument("--reps", type=int, default=5)
+    c.add_argument("--workers", type=int, default=2)
+    c.add_argument("--threads", type=int, default=2)
+    c.add_argument("--no-cache", action="store_true")
+    c.add_argument("--out", default="bench-results.json")
+    c.set_defaults(fn=bench_endpoints)
+    args = p.parse_args(argv)
+    return args.fn(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
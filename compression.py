@@ -0,0 +1,51 @@
+"""
+Compressão das respostas negociada pelo Accept-Encoding (gzip ou deflate).
+
+Só comprime corpos a partir de COMPRESS_MIN_BYTES e de tipos textuais (JSON,
+NDJSON, texto). Respostas em fluxo (/classify-stream) saem como estão: o
+tamanho não é conhecido e cada chunk precisa chegar ao cliente na hora. O ETag
+de uma resposta comprimida vira fraco (W/"..."): a representação muda, mas o
+If-None-Match (comparação fraca) continua valendo para qualquer codificação.
+"""
+import gzip
+import os
+import zlib
+
+from flask import current_app, request
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))      # 1 (rápido) … 9 (menor); 0 desliga
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "application/vnd.brand-matrix.columnar+json",
+                "text/")
+
+ENCODERS = {
+    # mtime=0: o mesmo corpo comprime sempre nos mesmos bytes
+    "gzip": lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+    "deflate": lambda data, level: zlib.compress(data, level),   # "deflate" do HTTP = formato zlib
+}
+
+def compress(data: bytes, encoding: str, level: int = COMPRESS_LEVEL) -> bytes:
+    return ENCODERS[encoding](data, level)
+
+def _after(response):
+    level = current_app.config["COMPRESS_LEVEL"]
+    if (not level or response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+            or not (200 <= response.status_code < 300) or not response.mimetype.startswith(COMPRESSIBLE)):
+        return response
+    if (response.content_length or 0) < current_app.config["COMPRESS_MIN_BYTES"]:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(list(ENCODERS))
+    if encoding is None:
+        return response
+    response.set_data(compress(response.get_data(), encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_app(app):
+    app.config.setdefault("COMPRESS_MIN_BYTES", COMPRESS_MIN_BYTES)
+    app.config.setdefault("COMPRESS_LEVEL", COMPRESS_LEVEL)
+    app.after_request(_after)
@@ -0,0 +1,112 @@
+"""
+Eliminação de quase-duplicatas entre achados (MinHash + LSH).
+
+Cada texto vira o conjunto de bigramas de palavras (minúsculas, sem acentos
+nem pontuação) e uma assinatura MinHash de SIG_BINS compartimentos, feita
+numa passada só (one-permutation hashing, com densificação dos vazios).
+As assinaturas são fatiadas em bandas: só quem cai no mesmo balde de alguma
+banda é comparado, e o par só é considerado duplicado se o Jaccard exato
+dos bigramas atingir o limiar. Tempo quase linear no número de achados.
+"""
+import os
+import re
+import unicodedata
+import zlib
+from typing import List
+
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.8"))  # Jaccard mínimo dos bigramas
+
+SIG_BINS = 32                  # potência de 2
+_BIN_BITS = SIG_BINS.bit_length() - 1
+_EMPTY = 1 << 32
+_SHIFT = 1 << (32 - _BIN_BITS)  # deslocamento por distância na densificação (acima de qualquer valor)
+BUCKET_MAX = 16                # representantes por balde; limita o custo com frases muito repetidas
+MIN_RECALL = 0.98              # chance mínima de um par no limiar cair num balde comum
+
+_WORD = re.compile(r"\w+")
+
+def tokens(text: str) -> List[str]:
+    t = unicodedata.normalize("NFKD", (text or "").lower()).encode("ascii", "ignore").decode()
+    return _WORD.findall(t)
+
+def shingles(toks) -> frozenset:
+    if len(toks) < 2:
+        return frozenset(toks)
+    return frozenset(a + " " + b for a, b in zip(toks, toks[1:]))
+
+def signature(sh):
+    """Assinatura densificada (lista de SIG_BINS inteiros); None se não há bigramas."""
+    if not sh:
+        return None
+    sig = [_EMPTY] * SIG_BINS
+    for s in sh:
+        h = zlib.crc32(s.encode())
+        i, v = h & (SIG_BINS - 1), h >> _BIN_BITS
+        if v < sig[i]:
+            sig[i] = v
+    if _EMPTY in sig:
+        # compartimento vazio herda o próximo preenchido (circular), deslocado pela distância
+        out, nxt, d = sig[:], None, 0
+        for j in range(2 * SIG_BINS - 1, -1, -1):
+            v = sig[j % SIG_BINS]
+            if v != _EMPTY:
+                nxt, d = v, 0
+            else:
+                d += 1
+                if j < SIG_BINS:
+                    out[j] = nxt + d * _SHIFT
+        sig = out
+    return sig
+
+def bands(threshold: float):
+    """(bandas, linhas por banda): a banda mais seletiva que ainda garante MIN_RECALL no limiar."""
+    for r in (8, 4, 2):
+        b = SIG_BINS // r
+        if 1 - (1 - threshold ** r) ** b >= MIN_RECALL:
+            return b, r
+    return SIG_BINS, 1
+
+def jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def near_duplicates(texts, threshold: float = DEDUP_THRESHOLD) -> List[List[int]]:
+    """
+    Agrupa os índices de textos quase duplicados, na ordem de chegada: cada texto
+    entra no grupo do primeiro representante com Jaccard >= threshold ou abre um
+    grupo novo (do qual passa a ser o representante, primeiro índice da lista).
+    """
+    n_bands, rows = bands(threshold)
+    groups, rep_shingles = [], []
+    exact, buckets = {}, {}
+    for i, text in enumerate(texts):
+        toks = tokens(text)
+        key = " ".join(toks) or (text or "").strip().lower()
+        g = exact.get(key)
+        if g is None:
+            sh = shingles(toks)
+            sig = signature(sh)
+            keys = [(band, *sig[band * rows:(band + 1) * rows]) for band in range(n_bands)] if sig else ()
+            tried = set()
+            for k in keys:
+                for cand in buckets.get(k, ()):
+                    if cand in tried:
+                        continue
+                    tried.add(cand)
+                    other = rep_shingles[cand]
+                    if min(len(sh), len(other)) >= threshold * max(len(sh), len(other)) \
+                            and jaccard(sh, other) >= threshold:
+                        g = cand
+                        break
+                if g is not None:
+                    break
+            if g is None:
+                g = len(groups)
+                groups.append([])
+                rep_shingles.append(sh)
+                for k in keys:
+                    bucket = buckets.setdefault(k, [])
+                    if len(bucket) < BUCKET_MAX:
+                        bucket.append(g)
+            exact[key] = g
+        groups[g].append(i)
+    return groups
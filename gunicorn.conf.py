@@ -0,0 +1,17 @@
+# Lido automaticamente pelo gunicorn (diretório de trabalho); as demais opções
+# ficam no startCommand do render.yaml.
+import os
+import shutil
+import tempfile
+
+# Métricas multiprocesso (prometheus_client): cada worker grava em arquivos mmap
+# neste diretório e o /metrics agrega todos. Precisa estar definido antes de o
+# app importar o prometheus_client, e começa vazio a cada subida do master.
+_metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                     os.path.join(tempfile.gettempdir(), "brand-matrix-metrics"))
+shutil.rmtree(_metrics_dir, ignore_errors=True)
+os.makedirs(_metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
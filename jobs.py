@@ -0,0 +1,154 @@
+"""
+Execução assíncrona das análises pesadas (M0, M0b, pipeline): o POST enfileira e
+devolve um job_id na hora; o cliente consulta o estado e busca o resultado depois.
+
+Cada worker do gunicorn tem seu executor (JOB_WORKERS threads) e aceita no máximo
+JOB_QUEUE_MAX jobs esperando além dos que estão rodando; cheio, o POST recebe 429
+com Retry-After. Estado e resultado ficam no SQLite do armazém de execuções, para
+que qualquer worker responda à consulta, com o mesmo TTL e limite em bytes
+(RUN_STORE_MAX_MB; sai primeiro o resultado mais antigo).
+"""
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import runs
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))        # threads de job por worker do gunicorn
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "8"))    # jobs esperando, por worker
+JOB_RETRY_MIN = 1                                            # segundos
+
+PENDING = ("queued", "running")
+JOB_ERROR = b'{"error":"falha interna ao executar o job"}'
+JOB_LOST = b'{"error":"o worker que rodava o job reiniciou; envie de novo"}'
+JOB_TOO_LARGE = b'{"error":"resultado do job acima de RUN_STORE_MAX_MB"}'
+
+log = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"fila de jobs cheia; tente de novo em {retry_after}s")
+        self.retry_after = retry_after
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobQueue(runs.SQLiteStore):
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+              "status TEXT NOT NULL, pid INTEGER NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, "
+              "http_status INTEGER, body BLOB)",
+              "CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+    TABLE, KEY = "jobs", "job_id"
+
+    def __init__(self, path: str = runs.RUN_STORE_PATH, workers: int = JOB_WORKERS,
+                 queue_max: int = JOB_QUEUE_MAX, ttl: int = runs.RUN_STORE_TTL,
+                 max_bytes: int = runs.RUN_STORE_MAX_MB * 1024 * 1024):
+        # resultados limitados como as saídas do armazém de execuções (cada tabela com o seu limite)
+        super().__init__(path, ttl, max_bytes)
+        self.workers, self.queue_max = max(1, workers), max(0, queue_max)
+        self._lock = threading.Lock()
+        self._pool, self._pool_pid = None, None
+        self._pending = 0
+        self._avg = None  # duração média (móvel) dos jobs deste worker
+        self.counts = {"accepted": 0, "rejected": 0, "done": 0, "failed": 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # um executor por processo: threads criadas no master (--preload) não existem nos workers
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+            self._pool_pid, self._pending = os.getpid(), 0
+        return self._pool
+
+    def retry_after(self) -> int:
+        """Segundos até abrir vaga, estimados pela duração média e pelo tamanho da fila."""
+        waves = max(1, self._pending - self.workers + 1) / self.workers
+        return max(JOB_RETRY_MIN, math.ceil((self._avg or JOB_RETRY_MIN) * waves))
+
+    def submit(self, kind: str, fn: Callable[[], Tuple[int, bytes]]) -> str:
+        """
+        Enfileira fn (que devolve (status HTTP, corpo)) e devolve o job_id.
+        QueueFull se já há JOB_WORKERS rodando e JOB_QUEUE_MAX esperando.
+        """
+        with self._lock:
+            pool = self._executor()
+            if self._pending >= self.workers + self.queue_max:
+                self.counts["rejected"] += 1
+                raise QueueFull(self.retry_after())
+            self._pending += 1
+            self.counts["accepted"] += 1
+        job_id, now = uuid.uuid4().hex, time.time()
+        try:
+            conn = self._conn()
+            conn.execute("INSERT INTO jobs (job_id, kind, status, pid, created, updated) "
+                         "VALUES (?, ?, 'queued', ?, ?, ?)", (job_id, kind, os.getpid(), now, now))
+            self._purge(conn, now)
+            pool.submit(self._run, job_id, fn)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[[], Tuple[int, bytes]]):
+        t0 = time.time()
+        status, body = 500, JOB_ERROR
+        try:
+            self._conn().execute("UPDATE jobs SET status = 'running', updated = ? WHERE job_id = ?", (t0, job_id))
+            status, body = fn()
+        except Exception:
+            log.exception("job %s falhou", job_id)
+        if len(body) > self.max_bytes:
+            status, body = 507, JOB_TOO_LARGE
+        try:
+            conn = self._conn()
+            conn.execute("UPDATE jobs SET status = ?, updated = ?, http_status = ?, body = ? WHERE job_id = ?",
+                         ("done" if status < 400 else "failed", time.time(), status, body, job_id))
+            self._evict(conn)  # só os terminados têm corpo
+        finally:
+            took = time.time() - t0
+            with self._lock:
+                self._pending -= 1
+                self._avg = took if self._avg is None else 0.8 * self._avg + 0.2 * took
+                self.counts["done" if status < 400 else "failed"] += 1
+
+    def get(self, job_id: str, with_body: bool = False) -> Optional[Dict]:
+        """Estado do job (e o corpo do resultado, se pedido); None se não existe ou expirou."""
+        cols = "kind, status, pid, created, updated, http_status" + (", body" if with_body else "")
+        row = self._conn().execute(f"SELECT {cols} FROM jobs WHERE job_id = ? AND created >= ?",
+                                   (str(job_id), time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        job = {"job_id": job_id, "kind": row[0], "status": row[1], "created": row[3], "updated": row[4],
+               "http_status": row[5]}
+        if with_body:
+            job["body"] = row[6]
+        if job["status"] in PENDING and not _alive(row[2]):
+            # o worker que tinha o job morreu (restart, timeout): não vai terminar
+            job.update(status="failed", http_status=503, body=JOB_LOST)
+            if not with_body:
+                job.pop("body")
+        return job
+
+    def shutdown(self):
+        """Espera os jobs em andamento, descarta o executor (o próximo submit cria outro) e zera os contadores."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self.counts, self._avg = dict.fromkeys(self.counts, 0), None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counts, "pending": self._pending, "workers": self.workers, "queue_max": self.queue_max,
+                    "avg_seconds": round(self._avg, 3) if self._avg is not None else None}
@@ -0,0 +1,99 @@
+"""
+Provedores JSON do app (app.json): o padrão do Flask sobre a stdlib ou, se
+instalado, o orjson (bem mais rápido para codificar e decodificar).
+
+JSON_PROVIDER escolhe: "auto" (orjson se importável), "orjson" ou "stdlib".
+Os dois expõem, além do dumps/loads do Flask, dumpb (já em bytes, sem passar
+por str) e quote (uma string codificada como o dumps a codificaria).
+"""
+import json
+import logging
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # opcional: sem orjson, fica a stdlib
+    orjson = None
+
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto")
+
+log = logging.getLogger(__name__)
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    O provedor padrão do Flask, com dumpb e quote. Fora do modo "pretty" (o mesmo
+    critério do response do Flask: debug ou compact=False), dumps e dumpb saem
+    compactos como o jsonify, sem os espaços depois de "," e ":".
+    """
+
+    def _pretty(self) -> bool:
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not self._pretty():
+            kwargs.setdefault("separators", (",", ":"))
+        return DefaultJSONProvider.dumps(self, obj, **kwargs)
+
+    def dumpb(self, obj) -> bytes:
+        return StdlibJSONProvider.dumps(self, obj).encode()
+
+    def quote(self, s) -> str:
+        if type(s) is not str:
+            return DefaultJSONProvider.dumps(self, s)
+        # o mesmo escape que o json.dumps aplica a uma string
+        if self.ensure_ascii:
+            return json.encoder.encode_basestring_ascii(s)
+        return json.encoder.encode_basestring(s)
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """
+    orjson: saída compacta em UTF-8, chaves ordenadas como no padrão do Flask e
+    datas pelo default do Flask (formato HTTP). O que o orjson recusa (inteiro
+    acima de 64 bits na saída, NaN na entrada...) cai na stdlib; na entrada, um
+    inteiro acima de 64 bits chega como float.
+    """
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def _options(self, indent=None) -> int:
+        opts = self.OPTIONS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return opts | orjson.OPT_INDENT_2 if indent else opts
+
+    def dumpb(self, obj, indent=None) -> bytes:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except orjson.JSONEncodeError:
+            return StdlibJSONProvider.dumpb(self, obj)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if set(kwargs) - {"indent", "separators"}:
+            return StdlibJSONProvider.dumps(self, obj, **kwargs)
+        return OrjsonJSONProvider.dumpb(self, obj, kwargs.get("indent")).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return json.loads(s)  # mesma resposta da stdlib, inclusive o erro
+
+    def quote(self, s) -> str:
+        return OrjsonJSONProvider.dumps(self, s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj, self._pretty()) + b"\n", mimetype=self.mimetype)
+
+PROVIDERS = {"stdlib": StdlibJSONProvider, "orjson": OrjsonJSONProvider}
+
+def provider_class(name: str = None):
+    name = name or JSON_PROVIDER
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name not in PROVIDERS:
+        raise RuntimeError(f"JSON_PROVIDER desconhecido: {name!r} (use auto, orjson ou stdlib)")
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson, mas o orjson não está instalado")
+    return PROVIDERS[name]
@@ -0,0 +1,113 @@
+"""
+Leitura incremental de um objeto JSON de topo a partir de um stream.
+
+Os arrays escolhidos (ex.: "findings") são percorridos elemento a elemento e
+cada elemento passa pela função de normalização assim que termina de chegar:
+nem o corpo inteiro nem o array bruto ficam em memória, só o trecho ainda não
+consumido do buffer. Os demais valores são decodificados inteiros. Cada valor
+sai do json.JSONDecoder.raw_decode (em C), com a mesma semântica do json.loads.
+"""
+import codecs
+import json
+from typing import Callable, Dict
+
+CHUNK = 64 * 1024
+_WS = " \t\n\r"
+_DECODER = json.JSONDecoder()
+
+class _Reader:
+    def __init__(self, stream):
+        self.stream = stream
+        self.text = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf, self.pos, self.eof = "", 0, False
+
+    def fill(self, want: int = CHUNK) -> bool:
+        """Acrescenta ao buffer pelo menos `want` bytes do stream (ou o que restar); False no fim."""
+        if self.eof:
+            return False
+        self.buf, self.pos = self.buf[self.pos:], 0
+        parts, got = [], 0
+        while got < want:
+            data = self.stream.read(max(CHUNK, want - got))
+            if not data:
+                self.eof = True
+                break
+            parts.append(data)
+            got += len(data)
+        try:
+            self.buf += self.text.decode(b"".join(parts), final=self.eof)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"corpo não é UTF-8 válido: {e}") from e
+        return got > 0
+
+    def peek(self) -> str:
+        """Próximo caractere que não é espaço (sem consumir); "" no fim do corpo."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def take(self, allowed: str) -> str:
+        c = self.peek()
+        if not c or c not in allowed:
+            raise ValueError(f"JSON inválido: esperado um de {allowed!r} na posição do corpo")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decodifica o próximo valor; lê mais do stream enquanto ele estiver incompleto."""
+        self.peek()
+        while True:
+            try:
+                v, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # incompleto (erro no fim do buffer ou string aberta): lê mais, dobrando o pedido
+                # para que um valor grande não seja reanalisado a cada 64 KB
+                truncated = e.pos >= len(self.buf) - 16 or e.msg.startswith("Unterminated string")
+                if truncated and self.fill(len(self.buf) - self.pos):
+                    continue
+                raise ValueError(f"JSON inválido: {e.msg}") from e
+            if end == len(self.buf) and self.fill():
+                continue  # número ou literal pode continuar no próximo bloco
+            self.pos = end
+            return v
+
+    def elements(self, fn: Callable):
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            item = fn(self.value())
+            if item is not None:
+                yield item
+            if self.take(",]") == "]":
+                return
+
+def read_object(stream, arrays: Dict[str, Callable]) -> Dict:
+    """
+    Lê o objeto JSON de topo do stream. Para cada chave de `arrays` cujo valor é
+    um array, devolve [fn(elemento), ...] sem os None. ValueError se o corpo não
+    for um objeto JSON válido.
+    """
+    r = _Reader(stream)
+    out = {}
+    r.take("{")
+    if r.peek() == "}":
+        r.pos += 1
+    else:
+        while True:
+            key = r.value()
+            if not isinstance(key, str):
+                raise ValueError("JSON inválido: chave deve ser string")
+            r.take(":")
+            fn = arrays.get(key)
+            out[key] = list(r.elements(fn)) if fn is not None and r.peek() == "[" else r.value()
+            if r.take(",}") == "}":
+                break
+    if r.peek():
+        raise ValueError("JSON inválido: conteúdo após o objeto")
+    return out
@@ -1,8 +1,34 @@
-from flask import Flask, request, jsonify
-from collections import defaultdict
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from flask import Blueprint, Flask, Request, Response, current_app, g, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from collections import OrderedDict, defaultdict
 from typing import List, Dict, Tuple
 
-app = Flask(__name__)
+try:
+    import numpy as np
+except ImportError:  # está no requirements.txt; sem ele, o lote da M2 opera sobre as máscaras em int
+    np = None
+
+import compression
+import dedup
+import jobs
+import jsonprovider
+import jsonstream
+import metrics
+import profiling
+import respcache
+import runs
+
 
 # =========================
 # Regras base
@@ -15,66 +41,252 @@ PILLARS = {
     "realização": ["unicidade","inspiração","transcendência","vitalidade","realização","auto-afirmação"],
 }
 
-# Palavras-chave por sub-benefício (pizzaria + genéricos). Ajuste/expanda à vontade.
-M1_KEYWORDS = [
-    # FUNCIONAIS
-    (["whatsapp","app","pedido","pagamento","pix","cartão","cartao","todos os dias",
-      "semi-pronta","semipronta","pizza store","entrega rápida","delivery rápido","rastreamento","status","avisamos","a caminho"],
-     ("funcionais","conveniência")),
-    (["rastreamento","status","avisamos","acompanhe","notificação"], ("funcionais","controle")),
-    (["qualidade","massa","fermentação","fermentacao","forno","processo","padrão","padrao","insumos","san marzano","napolitana","longa maturação","longa maturacao"],
-     ("funcionais","desempenho")),
-    (["pet friendly","pet-friendly","petfriendly","cuidado"], ("funcionais","cuidado")),
-    (["otimização","otimizacao","agilidade","eficiência","eficiencia"], ("funcionais","otimização")),
-    (["segurança","seguro","confiável","confiavel"], ("funcionais","segurança")),
-
-    # EXPERIENCIAIS
-    (["evento","eventos","serviço de eventos","levamos a experiência","preparadas na hora","ao vivo"],
-     ("experienciais","capacitadoras")),
-    (["sabor","ingrediente","mozzarella de búfala","alho negro","pera","gorgonzola","pepperoni","textura","aroma","cornicione"],
-     ("experienciais","sensoriais")),
-    (["experiência única","inesquecível","prazer","delícia","memória","memoria","desejo"],
-     ("experienciais","hedonismo")),
-    (["convivio","convívio","familiar","amigos","família","familia","acolhedor","acolhimento"],
-     ("experienciais","convívio")),
-    (["criamos","autoral","autorais","edição limitada","sazonal"],
-     ("experienciais","criadoras")),
-    (["transforma","transformacional","descoberta","aprendizado"],
-     ("experienciais","transformacionais")),
-
-    # SOCIAIS
-    (["mais desejada","prêmio","premio","selo","imprensa","matéria","ranking","destaque","influenciador"],
-     ("sociais","reconhecimento")),
-    (["comunidade","grupo","pertencer","club","tribo","tribal"], ("sociais","tribais")),
-    (["conexão","compartilhar","marcar","ugc","hashtag"], ("sociais","conexão")),
-    (["superior","topo","elite","premium"], ("sociais","superioridade")),
-    (["conforme","padrão do setor","obrigatório"], ("sociais","conformidade")),
-    (["certificação","qualificado","qualificação"], ("sociais","qualificação")),
-
-    # EXPRESSÃO
-    (["reels","conteúdo","conteudo","promoção","siga","seguir","call to action"],
-     ("expressão","engajamento")),
-    (["manifesto","posicionamento","visão de mundo","proposito","propósito","vanguarda","independência","individualidade","personalidade"],
-     ("expressão","visão de mundo")),
-
-    # REALIZAÇÃO
-    (["massa leve","levíssima","digestível","saudável","leveza","vitalidade"],
-     ("realização","vitalidade")),
-    (["inspiração","inspirador","orgulho","autoestima","auto-afirmação","auto afirmacao"],
-     ("realização","inspiração")),
-    (["única","secreta","exclusiva","unicidade","bairro charmoso","surpreendente"],
-     ("realização","unicidade")),
-    (["transcendência","transcendencia","superação"], ("realização","transcendência")),
-    (["realização pessoal","objetivo atingido"], ("realização","realização")),
-]
+# Índice canônico dos sub-benefícios (ordem de PILLARS): o bit i de uma máscara de
+# cobertura corresponde a SUB_BENEFITS[i].
+SUB_BENEFITS = tuple((pillar, sub) for pillar, subs in PILLARS.items() for sub in subs)
+SUB_INDEX = {key: i for i, key in enumerate(SUB_BENEFITS)}
+FULL_MASK = (1 << len(SUB_BENEFITS)) - 1
+MASK_ORDER = [f"{pillar}/{sub}" for pillar, sub in SUB_BENEFITS]
+
+def mask_rows(mask: int) -> List[Dict]:
+    return [{"pillar": pillar, "sub_benefit": sub, "found": bool(mask >> i & 1)}
+            for i, (pillar, sub) in enumerate(SUB_BENEFITS)]
+
+def competitor_bits(comparison):
+    """
+    Máscaras de cobertura de uma 'comparison' da M0b: uma por competidor no formato
+    compacto ("found_mask") ou um bit por linha encontrada no formato "matrix".
+    """
+    for compo in comparison:
+        mask = compo.get("found_mask")
+        if isinstance(mask, int):
+            yield mask & FULL_MASK
+            continue
+        for row in compo.get("matrix", []):
+            if row.get("found"):
+                i = SUB_INDEX.get((row.get("pillar",""), row.get("sub_benefit","")))
+                if i is not None:
+                    yield 1 << i
+
+def parity_mask(masks) -> int:
+    """Bits cobertos por 2 ou mais máscaras (contador saturado em dois bits)."""
+    ones = twos = 0
+    for m in masks:
+        twos |= ones & m
+        ones |= m
+    return twos
+
+# =========================
+# Pacotes de palavras-chave por categoria
+# =========================
+# Um arquivo JSON por categoria em KEYWORD_PACKS_DIR (o nome do arquivo é a categoria):
+#   {"aliases": ["..."], "fallback": ["pilar","sub"],
+#    "groups": [{"tag": ["pilar","sub"], "keywords": ["...", ...]}, ...]}   # grupos em ordem de prioridade
+# A "category" da requisição escolhe o pacote (nome ou alias, sem diferenciar
+# maiúsculas); vazia ou desconhecida, vale o KEYWORD_DEFAULT_PACK.
+KEYWORD_PACKS_DIR = os.environ.get("KEYWORD_PACKS_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                        "keyword_packs")
+KEYWORD_DEFAULT_PACK = os.environ.get("KEYWORD_DEFAULT_PACK", "pizzaria")
+# segundos entre verificações dos arquivos (por worker); 0 verifica a cada chamada, negativo desliga o hot reload
+KEYWORD_PACKS_CHECK = float(os.environ.get("KEYWORD_PACKS_CHECK", "2"))
+
+FALLBACK_TAG = ("funcionais","conveniência")  # quando o pacote não define "fallback"
+
+log = logging.getLogger(__name__)
+
+def _pack_tag(path, value) -> Tuple[str, str]:
+    tag = tuple(value) if isinstance(value, list) else None
+    if tag not in SUB_INDEX:
+        raise ValueError(f"{path}: sub-benefício desconhecido {value!r}")
+    return tag
+
+def read_pack(path: str):
+    """Lê e valida um arquivo de pacote: (tabela [(keywords, tag)], fallback, aliases). ValueError se inválido."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("groups"), list):
+        raise ValueError(f"{path}: esperado um objeto com 'groups'")
+    table = []
+    for group in data["groups"]:
+        keys = group.get("keywords") if isinstance(group, dict) else None
+        if not isinstance(keys, list) or not all(isinstance(k, str) and k.strip() for k in keys):
+            raise ValueError(f"{path}: grupo sem 'keywords' válidas")
+        table.append(([k.lower() for k in keys], _pack_tag(path, group.get("tag"))))
+    fallback = _pack_tag(path, data["fallback"]) if "fallback" in data else FALLBACK_TAG
+    aliases = [str(a).strip().lower() for a in data.get("aliases") or []]
+    return table, fallback, aliases
+
+def compile_keywords(table) -> Tuple[Tuple[str, Tuple[str, str]], ...]:
+    """
+    Achata a tabela (grupos em ordem de prioridade) numa única sequência
+    (palavra, (pilar, sub)) montada uma vez. Remove repetidas e as que contêm
+    uma palavra de prioridade igual ou maior (nunca decidiriam nada), mantendo
+    o mesmo primeiro grupo vencedor da varredura grupo a grupo.
+    """
+    flat, seen = [], set()
+    for keys, tag in table:
+        for k in keys:
+            if k in seen:
+                continue
+            seen.add(k)
+            flat.append((k, tuple(tag)))
+    return tuple((k, tag) for i, (k, tag) in enumerate(flat)
+                 if not any(prev in k for prev, _ in flat[:i]))
+
+class LRUCache:
+    """LRU limitado e thread-safe, com contadores de acertos, erros e despejos."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"maxsize": self.maxsize, "size": len(self._data),
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+# capacidade por worker e por pacote; 0 desliga o cache
+CLASSIFY_CACHE_SIZE = int(os.environ.get("CLASSIFY_CACHE_SIZE", "20000"))
+# textos maiores (em caracteres) não entram no cache: a chave é o texto inteiro, e
+# assim o cache fica em até CLASSIFY_CACHE_SIZE × CLASSIFY_CACHE_MAX_TEXT por pacote
+CLASSIFY_CACHE_MAX_TEXT = int(os.environ.get("CLASSIFY_CACHE_MAX_TEXT", "512"))
+
+class KeywordPack:
+    """Pacote compilado: tabela de origem, matcher achatado, fallback e cache próprio."""
+    __slots__ = ("name", "table", "matcher", "fallback", "aliases", "cache")
+
+    def __init__(self, name, table, fallback, aliases, cache_size):
+        self.name, self.table, self.fallback, self.aliases = name, table, fallback, aliases
+        self.matcher = compile_keywords(table)
+        self.cache = LRUCache(cache_size)
+
+# (pacotes por nome, alias → nome, assinatura (mtime, tamanho) de cada arquivo) —
+# trocados juntos numa única atribuição; quem já pegou um pacote termina com ele
+_PACKS = ({}, {}, {})
+_packs_lock = threading.Lock()
+_packs_next_check = 0.0
+_cache_size = CLASSIFY_CACHE_SIZE
+
+def _scan_packs(force: bool):
+    """Recompila os pacotes novos ou alterados (todos, se force) e publica o registro novo."""
+    global _PACKS
+    packs, _, stamps = _PACKS
+    try:
+        entries = [e for e in os.scandir(KEYWORD_PACKS_DIR) if e.name.endswith(".json") and e.is_file()]
+    except OSError as e:
+        if not packs:
+            raise RuntimeError(f"pacotes de palavras-chave indisponíveis: {e}") from e
+        log.warning("pacotes de palavras-chave não verificados: %s", e)
+        return _PACKS
+
+    new_packs, new_stamps = {}, {}
+    for entry in sorted(entries, key=lambda e: e.name):
+        name = entry.name[:-5].lower()
+        try:
+            st = entry.stat()
+            stamp = new_stamps[name] = (st.st_mtime_ns, st.st_size)
+            if not force and stamps.get(name) == stamp:
+                if name in packs:
+                    new_packs[name] = packs[name]
+                continue
+            table, fallback, aliases = read_pack(entry.path)
+        except (OSError, ValueError) as e:
+            # arquivo quebrado: segue com a versão anterior (se houver) até ser corrigido
+            log.warning("pacote de palavras-chave '%s' ignorado: %s", name, e)
+            if name in packs:
+                new_packs[name] = packs[name]
+            continue
+        new_packs[name] = KeywordPack(name, table, fallback, aliases, _cache_size)
+
+    if KEYWORD_DEFAULT_PACK not in new_packs:
+        if KEYWORD_DEFAULT_PACK not in packs:
+            raise RuntimeError(f"pacote padrão '{KEYWORD_DEFAULT_PACK}' não encontrado em {KEYWORD_PACKS_DIR}")
+        new_packs[KEYWORD_DEFAULT_PACK] = packs[KEYWORD_DEFAULT_PACK]
+    aliases = {}
+    for name, pack in new_packs.items():
+        for alias in pack.aliases:
+            aliases.setdefault(alias, name)
+    aliases.update((name, name) for name in new_packs)
+    _PACKS = (new_packs, aliases, new_stamps)
+    return _PACKS
 
-def classify_snippet(text: str) -> Tuple[str, str]:
+def reload_keywords(cache_size: int = None):
+    """Relê e recompila todos os pacotes e descarta os caches."""
+    global _cache_size
+    with _packs_lock:
+        if cache_size is not None:
+            _cache_size = cache_size
+        return _scan_packs(force=True)
+
+reload_keywords()
+
+def keyword_pack(category: str = None) -> KeywordPack:
+    """Pacote da categoria (nome ou alias); o padrão se vazia, desconhecida ou não for string."""
+    global _packs_next_check
+    if KEYWORD_PACKS_CHECK >= 0 and time.monotonic() >= _packs_next_check and _packs_lock.acquire(blocking=False):
+        # uma thread verifica os arquivos; as demais seguem com o registro atual
+        try:
+            _packs_next_check = time.monotonic() + KEYWORD_PACKS_CHECK
+            _scan_packs(force=False)
+        finally:
+            _packs_lock.release()
+    packs, aliases, _ = _PACKS
+    key = category.strip().lower() if isinstance(category, str) else ""
+    return packs[aliases.get(key, KEYWORD_DEFAULT_PACK)]
+
+def classify_cache_stats(category: str = None) -> Dict:
+    return keyword_pack(category).cache.stats()
+
+def keyword_pack_stats() -> Dict:
+    packs, _, _ = _PACKS
+    return {name: {"groups": len(p.table), "keywords": len(p.matcher), "aliases": p.aliases,
+                   "default": name == KEYWORD_DEFAULT_PACK, "cache": p.cache.stats()}
+            for name, p in packs.items()}
+
+@metrics.timed_classify
+def classify_snippet(text: str, category: str = None) -> Tuple[str, str]:
     t = (text or "").lower()
-    for keys, tag in M1_KEYWORDS:
-        if any(k in t for k in keys):
-            return tag
-    # fallback bem conservador
-    return ("funcionais","conveniência")
+    pack = keyword_pack(category)
+    cached = len(t) <= CLASSIFY_CACHE_MAX_TEXT
+    tag = pack.cache.get(t) if cached else None
+    if tag is None:
+        tag = pack.fallback  # fallback bem conservador
+        for k, kw_tag in pack.matcher:
+            if k in t:
+                tag = kw_tag
+                break
+        if cached:
+            pack.cache.put(t, tag)
+    return tag
 
 def ensure(val, default):
     if isinstance(val, str):
@@ -83,18 +295,263 @@ def ensure(val, default):
         return val if len(val) > 0 else default
     return val if val else default
 
+def evidence_row(ev, category: str = None):
+    """Linha classificada da M1 para uma evidência; None se não houver texto."""
+    text = (ev or {}).get("text","").strip()
+    if not text:
+        return None
+    pillar, sub = classify_snippet(text, category)
+    return {
+        "pillar": pillar,
+        "sub_benefit": sub,
+        "evidence": text,
+        "source": ensure((ev or {}).get("source_name","").strip(), "N/A"),
+        "source_type": ensure((ev or {}).get("source_type","").strip(), "unknown"),
+        "url": ensure((ev or {}).get("url","").strip(), ""),
+        "captured_at": ensure((ev or {}).get("captured_at","").strip(), ""),
+        "found": True,
+        "approved": False,   # a aprovação é do usuário, no GPT
+        "suggested": False
+    }
+
+# =========================
+# Formato colunar (opt-in: ?format=columnar ou Accept: COLUMNAR_MIME)
+# =========================
+COLUMNAR_MIME = "application/vnd.brand-matrix.columnar+json"
+
+def wants_columnar() -> bool:
+    fmt = request.args.get("format")
+    if fmt:
+        return fmt == "columnar"
+    return request.accept_mimetypes.best_match(["application/json", COLUMNAR_MIME]) == COLUMNAR_MIME
+
+def to_columnar(rows: List[Dict]) -> Dict:
+    """
+    Lista de dicts de mesmo formato → {"length", "fields", "columns"}: um array por campo.
+    Colunas de strings com repetição vão como {"dict":[valores únicos], "codes":[índices]}.
+    """
+    fields = list(dict.fromkeys(k for r in rows for k in r))
+    columns = {}
+    for f in fields:
+        values = [r.get(f) for r in rows]
+        uniq = list(dict.fromkeys(v for v in values if isinstance(v, str)))
+        if len(uniq) < len(values) and all(isinstance(v, str) for v in values):
+            pos = {v: i for i, v in enumerate(uniq)}
+            columns[f] = {"dict": uniq, "codes": [pos[v] for v in values]}
+        else:
+            columns[f] = values
+    return {"length": len(rows), "fields": fields, "columns": columns}
+
+def flat_comparison(comparison: List[Dict]) -> List[Dict]:
+    """comparison da M0b achatada numa tabela só (uma linha por competidor × sub-benefício)."""
+    if any("matrix" in c for c in comparison):
+        return [{"competitor": c["competitor"], **row} for c in comparison for row in c.get("matrix", [])]
+    return comparison
+
+# campo tabular de cada etapa
+COLUMNAR_FIELDS = {"m0b": "comparison", "m2": "grid", "m3": "decisions", "m5": "plan"}
+
+def columnar(out: Dict, stage: str) -> Dict:
+    field = COLUMNAR_FIELDS[stage]
+    rows = out.get(field) or []
+    if stage == "m0b":
+        rows = flat_comparison(rows)
+    out[field] = to_columnar(rows)
+    out["encoding"] = "columnar"
+    return out
+
+def stage_response(out: Dict, stage: str):
+    if stage in COLUMNAR_FIELDS and wants_columnar():
+        out = columnar(out, stage)
+    resp = jsonify(out)
+    resp.vary.add("Accept")
+    return resp, 200
+
+# =========================
+# Corpo da requisição: limite por rota e leitura em fluxo
+# =========================
+MB = 1024 * 1024
+# rotas sem entrada aqui usam MAX_BODY_BYTES; as que leem os achados em fluxo aceitam mais
+BODY_LIMITS = {"/m0-pesquisa": 256 * MB, "/m0-competidores": 256 * MB, "/pipeline": 256 * MB,
+               "/classify-stream": 1024 * MB, "/jobs/<kind>": 256 * MB}
+
+def parse_size(value) -> int:
+    """'512KB', '64MB', '1GB' ou bytes."""
+    v = str(value).strip().upper().removesuffix("B")
+    mult = {"K": 1024, "M": MB, "G": 1024 * MB}.get(v[-1:], 1)
+    return int(float(v[:-1] if mult > 1 else v) * mult)
+
+def body_limits_from_env() -> Tuple[int, Dict[str, int]]:
+    """MAX_BODY_BYTES e BODY_LIMITS ("/rota=64MB,/outra=1GB") sobre os padrões."""
+    limits = dict(BODY_LIMITS)
+    for item in filter(None, os.environ.get("BODY_LIMITS", "").split(",")):
+        rule, _, size = item.partition("=")
+        limits[rule.strip()] = parse_size(size)
+    return parse_size(os.environ.get("MAX_BODY_BYTES", "32MB")), limits
+
+class LimitedRequest(Request):
+    """Request cujo teto de corpo vem da rota (o werkzeug aplica: 413, inclusive em chunked)."""
+
+    @property
+    def max_content_length(self):
+        rule = self.url_rule.rule if self.url_rule else None
+        return current_app.config["BODY_LIMITS"].get(rule, current_app.config["MAX_BODY_BYTES"])
+
+def body_too_large(e):
+    return jsonify({"error": f"corpo acima do limite de {request.max_content_length} bytes para esta rota",
+                    "limit": request.max_content_length}), 413
+
+def request_body(stream_arrays: Dict = None) -> Dict:
+    """
+    Corpo JSON da requisição. Com stream_arrays ({chave: normalização}), lê o corpo
+    em fluxo: esses arrays são normalizados elemento a elemento enquanto chegam.
+    """
+    if not stream_arrays:
+        b = request.get_json(silent=True) or {}
+    elif not request.is_json:
+        b = {}
+    else:
+        t0 = time.perf_counter()
+        try:
+            b = jsonstream.read_object(request.stream, stream_arrays)
+        except ValueError:
+            b = {}  # como o get_json(silent=True)
+        if metrics.CLOCK.active:
+            metrics.CLOCK.json_loads += time.perf_counter() - t0
+    g.request_body = b
+    return b
+
+# =========================
+# Cache de respostas (etapas que são função pura do corpo) + ETag / If-None-Match
+# =========================
+CACHED_STAGES = {"m2", "m3", "m4", "m5"}
+# muda quando o código muda: o que ficou no nível em disco não serve para outra versão
+CODE_VERSION = hashlib.blake2b(open(__file__, "rb").read(), digest_size=8).hexdigest()
+RESPONSES = respcache.ResponseCache(salt=CODE_VERSION)
+
+def run_stage(stage: str, fn, b: Dict, run_id, encoded: bool = False) -> Tuple[Dict, bytes]:
+    """
+    Roda a etapa, carimba e guarda a saída; devolve (saída, JSON serializado).
+    Com encoded, etapas com STAGE_ENCODERS saem direto em bytes (saída None).
+    """
+    encode = STAGE_ENCODERS.get(stage) if encoded else None
+    if encode is not None:
+        ids = runs.stamp({}, run_id)
+        body = encode(b, ids)
+        runs.record(ids, stage, body)
+        return None, body
+    out = runs.stamp(fn(b), run_id)
+    body = current_app.json.dumpb(out)
+    runs.record(out, stage, body)
+    return out, body
+
+def stage_view(stage: str, fn, stream_arrays: Dict = None):
+    """
+    Corpo da view de uma etapa: resolve referências *_id ao armazém de execuções,
+    roda a etapa, guarda a saída (run_id/stage_id) e responde no formato negociado.
+    O JSON guardado é o mesmo da resposta em linhas: serializa uma vez só.
+    Nas CACHED_STAGES o mesmo corpo devolve a resposta guardada (com ETag; 304 se
+    o cliente já a tem), sem recalcular, enquanto o stage_id dela ainda resolve.
+    """
+    key, cached, b, out, etag = None, None, None, None, None
+    col = stage in COLUMNAR_FIELDS and wants_columnar()
+    if stage in CACHED_STAGES and RESPONSES.enabled and not stream_arrays:
+        key, cached, g.response_cache, b = RESPONSES.find(stage, request.get_data(cache=True),
+                                                          lambda: request_body(stream_arrays), runs.resolvable)
+    if cached:
+        etag, body = cached
+    else:
+        if b is None:
+            b = request_body(stream_arrays)
+        try:
+            run_id = runs.resolve(b)
+        except runs.RunNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        try:
+            out, body = run_stage(stage, fn, b, run_id, encoded=not col)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if key:
+            etag = RESPONSES.put(key, body)
+
+    if etag and col:
+        etag += "-columnar"
+    if etag and request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    elif col:
+        resp, _ = stage_response(out if out is not None else current_app.json.loads(body), stage)
+    else:
+        resp = Response(body + b"\n", mimetype="application/json")
+    resp.vary.add("Accept")
+    if etag:
+        resp.set_etag(etag)
+    return resp
+
 # =========================
 # Health
 # =========================
-@app.get("/health")
+ops_bp = Blueprint("ops", __name__)
+
+@ops_bp.get("/health")
 def health():
-    return jsonify({"ok": True, "service": "brand-matrix"}), 200
+    return jsonify({"ok": True, "service": "brand-matrix", "version": "1.0.0"}), 200
+
+@ops_bp.get("/stats")
+def stats():
+    return jsonify({"classify_cache": classify_cache_stats(), "keyword_packs": keyword_pack_stats(),
+                    "response_cache": RESPONSES.stats(), "run_store": runs.STORE.stats(),
+                    "jobs": JOBS.stats()}), 200
+
+# =========================
+# Quase-duplicatas (opt-in: "dedup": true, "dedup_threshold" opcional)
+# =========================
+SOURCE_FIELDS = ("source_type", "source_name", "url", "captured_at")
+
+def requested_dedup(b: Dict):
+    """Limiar de similaridade pedido no corpo; None se não pediu dedup."""
+    if not b.get("dedup"):
+        return None
+    t = b.get("dedup_threshold", dedup.DEDUP_THRESHOLD)
+    if isinstance(t, bool) or not isinstance(t, (int, float)) or not 0 < t <= 1:
+        raise ValueError("dedup_threshold deve ser um número em (0, 1]")
+    return float(t)
+
+def collapse_duplicates(items: List[Dict], threshold: float) -> List[Dict]:
+    """Junta achados quase duplicados no primeiro deles; "sources" lista a origem de cada um."""
+    out = []
+    for group in dedup.near_duplicates([it["text"] for it in items], threshold):
+        merged = dict(items[group[0]])
+        sources, seen = [], set()
+        for i in group:
+            src = tuple(items[i][k] for k in SOURCE_FIELDS)
+            if src not in seen:
+                seen.add(src)
+                sources.append(dict(zip(SOURCE_FIELDS, src)))
+        merged["sources"] = sources
+        out.append(merged)
+    return out
+
+def dedup_report(threshold: float, n_in: int, n_out: int) -> Dict:
+    return {"threshold": threshold, "input": n_in, "output": n_out, "removed": n_in - n_out,
+            "reduction": round(1 - n_out / n_in, 4) if n_in else 0.0}
 
 # =========================
 # M0 — Pesquisa (cliente/GPT faz a busca; aqui só normaliza)
 # =========================
-@app.post("/m0-pesquisa")
-def m0_pesquisa():
+def m0_finding(f):
+    """Achado normalizado (M0/M0b); None se não houver texto. Aplicar de novo não muda nada."""
+    txt = ensure((f or {}).get("text","").strip(), "")
+    if not txt:
+        return None
+    return {
+        "text": txt,
+        "source_type": (f or {}).get("source_type","").lower() or "unknown",
+        "source_name": ensure((f or {}).get("source_name","").strip(), "N/A"),
+        "url": ensure((f or {}).get("url","").strip(), ""),
+        "captured_at": ensure((f or {}).get("captured_at","").strip(), "")
+    }
+
+def run_m0_pesquisa(b: Dict) -> Dict:
     """
     Espera:
     {
@@ -103,43 +560,104 @@ def m0_pesquisa():
       "findings": [
         { "text": "...", "source_type":"website|instagram|facebook|maps|news|menu|app",
           "source_name":"...", "url":"https://...", "captured_at":"2025-10-03" }
-      ]
+      ],
+      "dedup": true, "dedup_threshold": 0.8    # opcional; junta quase-duplicatas
     }
     """
-    b = request.get_json(silent=True) or {}
     brand = b.get("brand",""); category = b.get("category","")
     findings = b.get("findings") or []
+    threshold = requested_dedup(b)
     normalized = []
     must = ["website","instagram","facebook","maps"]
     seen = set()
 
     for f in findings:
-        txt = ensure((f or {}).get("text","").strip(), "")
-        if not txt:
+        n = m0_finding(f)
+        if n is None:
             continue
-        st = (f or {}).get("source_type","").lower() or "unknown"
-        sn = ensure((f or {}).get("source_name","").strip(), "N/A")
-        url = ensure((f or {}).get("url","").strip(), "")
-        dt  = ensure((f or {}).get("captured_at","").strip(), "")
-        normalized.append({"text": txt, "source_type": st, "source_name": sn, "url": url, "captured_at": dt})
-        if st: seen.add(st)
+        normalized.append(n)
+        seen.add(n["source_type"])
 
     missing_sources = [s for s in must if s not in seen]
 
-    return jsonify({
+    out = {
         "brand": brand,
         "category": category,
         "stage": "research",
         "evidence": normalized,
         "missing_sources": missing_sources,
         "notes": "Servidor não navega; a coleta vem do cliente (GPT) e é normalizada aqui."
-    }), 200
+    }
+    if threshold is not None:
+        out["evidence"] = collapse_duplicates(normalized, threshold)
+        out["dedup"] = dedup_report(threshold, len(normalized), len(out["evidence"]))
+    return out
+
+m0_bp = Blueprint("m0", __name__)
+
+@m0_bp.post("/m0-pesquisa")
+def m0_pesquisa():
+    return stage_view("m0", run_m0_pesquisa, {"findings": m0_finding})
 
 # =========================
 # M0b — Competidores (normalização + base comparativa)
 # =========================
-@app.post("/m0-competidores")
-def m0_competidores():
+# execução por competidor: "serial" | "thread" | "process"
+M0B_BACKEND = os.environ.get("M0B_BACKEND", "serial")
+M0B_WORKERS = int(os.environ.get("M0B_WORKERS", "0")) or (os.cpu_count() or 1)
+M0B_PARALLEL_MIN = int(os.environ.get("M0B_PARALLEL_MIN", "8"))  # abaixo disso, serial
+
+_pools, _pools_lock = {}, threading.Lock()
+
+def _pool(backend: str, workers: int):
+    with _pools_lock:
+        pool = _pools.get((backend, workers))
+        if pool is None:
+            if backend == "process":
+                # spawn: o worker do gunicorn tem threads; fork herdaria locks em uso
+                pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                pool = ThreadPoolExecutor(workers, thread_name_prefix="m0b")
+            _pools[(backend, workers)] = pool
+        return pool
+
+def m0b_competitor(c, category: str = None, threshold: float = None):
+    """
+    Normaliza (e, com threshold, deduplica) e classifica um competidor:
+    (competitor, máscara de cobertura, achados antes da dedup) ou None se vazio.
+    """
+    name = ensure((c or {}).get("competitor","").strip(), "")
+    items = [n for n in map(m0_finding, (c or {}).get("findings") or []) if n is not None]
+    if not (name and items):
+        return None
+    n_in = len(items)
+    if threshold is not None:
+        items = collapse_duplicates(items, threshold)
+
+    # base comparativa (apenas marca ✓/– por sub-benefício, sem “inventar”)
+    mask = 0
+    for ev in items:
+        i = SUB_INDEX.get(classify_snippet(ev.get("text",""), category))
+        if i is not None:
+            mask |= 1 << i
+    return {"competitor": name, "evidence": items}, mask, n_in
+
+def m0b_entry(c):
+    """Competidor com os achados já normalizados (leitura em fluxo do corpo)."""
+    if not isinstance(c, dict):
+        return c
+    return {**c, "findings": [n for n in map(m0_finding, c.get("findings") or []) if n is not None]}
+
+def map_competitors(comp, backend: str = None, workers: int = None, category: str = None, threshold: float = None):
+    """Aplica m0b_competitor em ordem; distribui no pool quando há competidores suficientes."""
+    backend = backend or M0B_BACKEND; workers = workers or M0B_WORKERS
+    if backend == "serial" or workers < 2 or len(comp) < M0B_PARALLEL_MIN:
+        return [m0b_competitor(c, category, threshold) for c in comp]
+    chunk = max(1, len(comp) // (workers * 4))
+    fn = partial(m0b_competitor, category=category, threshold=threshold)
+    return list(_pool(backend, workers).map(fn, comp, chunksize=chunk))
+
+def run_m0_competidores(b: Dict, backend: str = None, workers: int = None) -> Dict:
     """
     Espera:
     {
@@ -149,104 +667,78 @@ def m0_competidores():
         { "competitor": "Concorrente A",
           "findings": [ {"text":"...","source_type":"maps","source_name":"Google Maps","url":"...","captured_at":"..."} ]
         }
-      ]
+      ],
+      "matrix_format": "rows"|"mask",  # opcional; "mask" troca "matrix" por "found_mask" (bit i = mask_order[i])
+      "dedup": true, "dedup_threshold": 0.8    # opcional; junta quase-duplicatas de cada competidor
     }
     """
-    b = request.get_json(silent=True) or {}
     brand = b.get("brand",""); category = b.get("category","")
     comp = b.get("competitors_findings") or []
+    threshold = requested_dedup(b)
 
-    comps_norm = []
-    # normaliza
-    for c in comp:
-        name = ensure((c or {}).get("competitor","").strip(), "")
-        items = []
-        for f in (c or {}).get("findings") or []:
-            txt = ensure((f or {}).get("text","").strip(), "")
-            if not txt: continue
-            items.append({
-                "text": txt,
-                "source_type": (f or {}).get("source_type","").lower() or "unknown",
-                "source_name": ensure((f or {}).get("source_name","").strip(), "N/A"),
-                "url": ensure((f or {}).get("url","").strip(), ""),
-                "captured_at": ensure((f or {}).get("captured_at","").strip(), "")
-            })
-        if name and items:
-            comps_norm.append({"competitor": name, "evidence": items})
+    compact = b.get("matrix_format") == "mask"
 
-    # base comparativa (apenas marca ✓/– por sub-benefício, sem “inventar”)
-    def classify_all(ev_list):
-        covered = defaultdict(set)
-        for ev in ev_list:
-            pillar, sub = classify_snippet(ev.get("text",""))
-            covered[pillar].add(sub)
-        return covered
-
-    comparison = []
-    for c in comps_norm:
-        covered = classify_all(c["evidence"])
-        rows = []
-        for pillar, subs in PILLARS.items():
-            for sub in subs:
-                rows.append({
-                    "pillar": pillar,
-                    "sub_benefit": sub,
-                    "found": sub in covered[pillar]
-                })
-        comparison.append({"competitor": c["competitor"], "matrix": rows})
+    comps_norm, comparison, n_in = [], [], 0
+    for entry in map_competitors(comp, backend, workers, category, threshold):
+        if entry is None: continue
+        norm, mask, n = entry
+        n_in += n
+        comps_norm.append(norm)
+        if compact:
+            comparison.append({"competitor": norm["competitor"], "found_mask": mask})
+        else:
+            comparison.append({"competitor": norm["competitor"], "matrix": mask_rows(mask)})
 
-    return jsonify({
+    out = {
         "brand": brand,
         "category": category,
         "stage": "competitors_research",
         "competitors": comps_norm,
         "comparison": comparison
-    }), 200
+    }
+    if compact:
+        out["mask_order"] = MASK_ORDER
+    if threshold is not None:
+        out["dedup"] = dedup_report(threshold, n_in, sum(len(c["evidence"]) for c in comps_norm))
+    return out
+
+m0b_bp = Blueprint("m0b", __name__)
+
+@m0b_bp.post("/m0-competidores")
+def m0_competidores():
+    return stage_view("m0b", run_m0_competidores, {"competitors_findings": m0b_entry})
 
 # =========================
 # M1 — Matriz de Benefícios
 # =========================
-@app.post("/m1-beneficios")
-def m1_beneficios():
+def run_m1_beneficios(body: Dict) -> Dict:
     """
     Espera:
     {
       "brand":"...", "scope":"...",
+      "category":"...",    # opcional; escolhe o pacote de palavras-chave
       "evidence":[{"text":"...","source_name":"...","source_type":"...","url":"...","captured_at":"..."}],
       "suggestions": [ {"text":"...","from":"category_pattern"} ]   # opcional
     }
+    Em vez de evidence, aceita from_m0_id (usa a evidence e a category da M0).
     """
-    body = request.get_json(silent=True) or {}
-    brand = body.get("brand",""); scope = body.get("scope","")
+    brand = body.get("brand",""); scope = body.get("scope",""); category = body.get("category","")
     evidences = body.get("evidence") or []
     suggestions = body.get("suggestions") or []
 
     rows, covered = [], defaultdict(set)
     for ev in evidences:
-        text = (ev or {}).get("text","").strip()
-        if not text: continue
-        pillar, sub = classify_snippet(text)
-        row = {
-            "pillar": pillar,
-            "sub_benefit": sub,
-            "evidence": text,
-            "source": ensure((ev or {}).get("source_name","").strip(), "N/A"),
-            "source_type": ensure((ev or {}).get("source_type","").strip(), "unknown"),
-            "url": ensure((ev or {}).get("url","").strip(), ""),
-            "captured_at": ensure((ev or {}).get("captured_at","").strip(), ""),
-            "found": True,
-            "approved": False,   # a aprovação é do usuário, no GPT
-            "suggested": False
-        }
+        row = evidence_row(ev, category)
+        if row is None: continue
         rows.append(row)
-        covered[pillar].add(sub)
+        covered[row["pillar"]].add(row["sub_benefit"])
 
     # sugestões (sem evidência; aguardam aprovação explícita)
     suggested_rows = []
     for s in suggestions:
         txt = ensure((s or {}).get("text","").strip(), "")
         if not txt: continue
-        pillar, sub = classify_snippet(txt)
+        pillar, sub = classify_snippet(txt, category)
         suggested_rows.append({
             "pillar": pillar, "sub_benefit": sub,
             "evidence": "", "source":"", "source_type":"", "url":"", "captured_at":"",
@@ -255,20 +747,198 @@ def m1_beneficios():
 
     missing_subs = { pillar: [s for s in subs if s not in covered[pillar]] for pillar, subs in PILLARS.items() }
 
-    return jsonify({
+    return {
         "brand": brand,
         "stage": "benefit_matrix",
         "attributes": rows,                 # encontrados
         "suggested": suggested_rows,        # sugeridos (pendentes)
         "missing_subbenefits": missing_subs,
         "notes": f"M1 classificada automaticamente — escopo: {scope}"
-    }), 200
+    }
+
+m1_bp = Blueprint("m1", __name__)
+
+@m1_bp.post("/m1-beneficios")
+def m1_beneficios():
+    return stage_view("m1", run_m1_beneficios)
+
+# =========================
+# Classificação em fluxo (NDJSON)
+# =========================
+STREAM_BATCH = 64  # linhas por chunk da resposta
+
+@m1_bp.post("/classify-stream")
+def classify_stream():
+    """
+    Espera (Content-Type: application/x-ndjson), um achado por linha:
+      {"text":"...","source_name":"...","source_type":"...","url":"...","captured_at":"..."}
+    Devolve uma linha da M1 por achado, na mesma ordem, sem montar o corpo inteiro
+    em memória. Linhas inválidas viram {"line": n, "error": "..."}; vazias são ignoradas.
+    ?category=... escolhe o pacote de palavras-chave.
+    """
+    if request.mimetype != "application/x-ndjson":
+        return jsonify({"error": "Content-Type deve ser application/x-ndjson"}), 415
+    category = request.args.get("category")
+
+    stream = request.stream
+    if isinstance(stream, io.RawIOBase):
+        # o LimitedStream do werkzeug é "raw": sem buffer, readline lê byte a byte
+        stream = io.BufferedReader(stream, 64 * 1024)
+
+    def rows():
+        for n, raw in enumerate(stream, start=1):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                ev = current_app.json.loads(line)
+            except ValueError:
+                yield {"line": n, "error": "JSON inválido"}
+                continue
+            if not isinstance(ev, dict):
+                yield {"line": n, "error": "esperado um objeto"}
+                continue
+            try:
+                row = evidence_row(ev, category)
+            except AttributeError:
+                yield {"line": n, "error": "campo com tipo inválido"}
+                continue
+            if row is not None:
+                yield row
+
+    def generate():
+        # agrupa linhas por escrita: um chunk HTTP por linha custa mais que classificar
+        dumpb, batch = current_app.json.dumpb, []
+        for row in rows():
+            batch.append(dumpb(row))
+            if len(batch) >= STREAM_BATCH:
+                yield b"\n".join(batch) + b"\n"
+                batch = []
+        if batch:
+            yield b"\n".join(batch) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 # =========================
 # M2 — Uso × Relevância (inclui não encontrados)
 # =========================
-@app.post("/m2-diferenciais")
-def m2_diferenciais():
+def m2_levels(found: bool, approved: bool, suggested: bool, parity: bool, only_approved: bool):
+    """Regras de uma linha da M2: (usage_level, relevance_level, recommendation, priority)."""
+    # regras conservadoras (sem inventar)
+    if only_approved and not approved:
+        base_usage = "nao_tem"
+        base_rel = "um_pouco_comum"
+    else:
+        base_usage = "temos_muito" if found and (not only_approved or approved) else "nao_tem"
+        base_rel = "gera_valor" if found and (not only_approved or approved) else "um_pouco_comum"
+
+    opportunity = not parity
+    if not found and not suggested:
+        rec, prio = "avaliar", "baixa"
+    elif found and (approved or not only_approved):
+        if opportunity:   rec, prio = "proteger", "alta"
+        elif parity:      rec, prio = "manter", "média"
+        else:             rec, prio = "aprimorar", "média"
+    else:
+        # sugerido (sem evidência aprovada)
+        rec, prio = "avaliar", "baixa"
+    return base_usage, base_rel, rec, prio
+
+# bits de entrada de m2_levels → código da linha (0..31); as regras viram uma tabela
+M2_FOUND, M2_APPROVED, M2_SUGGESTED, M2_PARITY, M2_ONLY = 1, 2, 4, 8, 16
+M2_RULES = tuple(m2_levels(bool(c & M2_FOUND), bool(c & M2_APPROVED), bool(c & M2_SUGGESTED),
+                           bool(c & M2_PARITY), bool(c & M2_ONLY)) for c in range(32))
+M2_NUMPY_MIN = 16   # marcas por lote a partir das quais vale montar os arrays
+_BITS = np.arange(len(SUB_BENEFITS), dtype=np.int64) if np is not None else None
+
+def m2_inputs(m1: Dict, approvals=None):
+    """(índice dos atributos por (pillar, sub), máscaras found, approved e suggested) de uma M1."""
+    if approvals:
+        apply_approvals(m1, approvals)
+    idx = {(a.get("pillar",""), a.get("sub_benefit","")): a for a in m1.get("attributes") or []}
+    sug_idx = {(s.get("pillar",""), s.get("sub_benefit","")): s for s in m1.get("suggested") or []}
+    found = approved = suggested = 0
+    for key, a in idx.items():
+        i = SUB_INDEX.get(key)
+        if i is not None and a:
+            found |= 1 << i
+            if a.get("approved"):
+                approved |= 1 << i
+    for key, s in sug_idx.items():
+        i = SUB_INDEX.get(key)
+        if i is not None and s:
+            suggested |= 1 << i
+    return idx, found, approved, suggested
+
+def m2_codes(found: int, approved: int, suggested: int, parity: int, only_approved: bool) -> List[int]:
+    """Código de cada sub-benefício (ordem de SUB_BENEFITS) a partir das máscaras."""
+    only = M2_ONLY if only_approved else 0
+    return [(found >> i & 1) | (approved >> i & 1) << 1 | (suggested >> i & 1) << 2 | (parity >> i & 1) << 3 | only
+            for i in range(len(SUB_BENEFITS))]
+
+def m2_codes_batch(found, approved, suggested, parity: int, only_approved) -> List[List[int]]:
+    """m2_codes de várias marcas de uma vez: matriz marcas × sub-benefícios (numpy, se houver)."""
+    if np is None or len(found) < M2_NUMPY_MIN:
+        return [m2_codes(f, a, s, parity, o) for f, a, s, o in zip(found, approved, suggested, only_approved)]
+    col = lambda masks: np.asarray(masks, dtype=np.int64)[:, None] >> _BITS & 1
+    codes = (col(found) | col(approved) << 1 | col(suggested) << 2 | (parity >> _BITS & 1) << 3
+             | np.asarray(only_approved, dtype=np.int64)[:, None] << 4)
+    return codes.tolist()
+
+def comp_counts(masks: List[int]) -> List[int]:
+    """Quantas máscaras de competidores cobrem cada sub-benefício (paridade = 2 ou mais)."""
+    if np is not None and len(masks) >= M2_NUMPY_MIN:
+        return (np.asarray(masks, dtype=np.int64)[:, None] >> _BITS & 1).sum(axis=0).tolist()
+    counts = [0] * len(SUB_BENEFITS)
+    for m in masks:
+        while m:
+            low = m & -m
+            counts[low.bit_length() - 1] += 1
+            m ^= low
+    return counts
+
+def _m2_row(pillar: str, sub: str, code: int) -> Dict:
+    usage, rel, rec, prio = M2_RULES[code]
+    return {
+        "pillar": pillar,
+        "sub_benefit": sub,
+        "found": bool(code & M2_FOUND),
+        "approved": bool(code & M2_APPROVED),
+        "suggested": bool(code & M2_SUGGESTED),
+        "usage_level": usage,
+        "relevance_level": rel,
+        "recommendation": rec,
+        "priority": prio,
+        "parity": bool(code & M2_PARITY),            # 2+ competidores têm
+        "opportunity": not code & M2_PARITY,         # 0 ou 1 competidor tem
+    }
+
+# linha da grade sem a evidência, por (sub-benefício, código): montar uma linha é copiar o modelo
+M2_ROWS = tuple(tuple(_m2_row(pillar, sub, code) for code in range(32)) for pillar, sub in SUB_BENEFITS)
+
+def m2_grid(idx: Dict, codes: List[int]) -> List[Dict]:
+    grid = []
+    for key, rows, code in zip(SUB_BENEFITS, M2_ROWS, codes):
+        a = idx.get(key) if code & M2_FOUND else None
+        evidence = [{
+            "quote": a.get("evidence",""),
+            "source": a.get("source",""),
+            "url": a.get("url",""),
+            "captured_at": a.get("captured_at","")
+        }] if a else []
+        grid.append({**rows[code], "evidence": evidence})
+    return grid
+
+def m2_output(brand: str, grid: List[Dict], only_approved: bool) -> Dict:
+    return {
+        "brand": brand,
+        "stage": "diferenciais_matrix",
+        "grid": grid,
+        "use_only_approved": only_approved,
+        "notes": "Sem invenção: aprovados conduzem; sugeridos ficam como avaliar."
+    }
+
+def run_m2_diferenciais(b: Dict) -> Dict:
     """
     Espera:
     {
@@ -278,105 +948,175 @@ def m2_diferenciais():
       },
       "use_only_approved": true|false,
       "from_competitors": { "comparison":[ {"competitor":"...", "matrix":[{pillar,sub_benefit,found}]} ] }  # opcional
+                          # ou {"competitor":"...", "found_mask": int} (formato compacto da M0b)
+      "approved": [{"pillar":"...","sub_benefit":"..."}]   # opcional; aprova sobre a M1 recebida
     }
+    Em vez de from_m1 / from_competitors, aceita from_m1_id / from_competitors_id.
     """
-    b = request.get_json(silent=True) or {}
-    brand = b.get("brand","")
-    m1 = b.get("from_m1") or {}
-    attrs = m1.get("attributes") or []
-    suggested = m1.get("suggested") or []
-    missing = m1.get("missing_subbenefits") or {}
     only_approved = bool(b.get("use_only_approved", False))
-
-    # índice por (pillar,sub)
-    idx = {(a.get("pillar",""), a.get("sub_benefit","")): a for a in attrs}
-    sug_idx = {(s.get("pillar",""), s.get("sub_benefit","")): s for s in suggested}
+    idx, found, approved, suggested = m2_inputs(b.get("from_m1") or {}, b.get("approved"))
 
     # info competitiva simples: paridade vs oportunidade
     comp = (b.get("from_competitors") or {}).get("comparison") or []
-    comp_count = defaultdict(int)
-    for compo in comp:
-        for row in compo.get("matrix", []):
-            if row.get("found"):
-                comp_count[(row.get("pillar",""), row.get("sub_benefit",""))] += 1
+    parity = parity_mask(competitor_bits(comp))
 
-    grid = []
-    for pillar, subs in PILLARS.items():
-        for sub in subs:
-            key = (pillar, sub)
-            a = idx.get(key)
-            s = sug_idx.get(key)
-            found = bool(a)
-            approved = bool(a and a.get("approved"))
-            suggested_flag = bool(s)
-
-            # regras conservadoras (sem inventar)
-            if only_approved and not approved:
-                base_usage = "nao_tem"
-                base_rel = "um_pouco_comum"
-            else:
-                base_usage = "temos_muito" if found and (not only_approved or approved) else "nao_tem"
-                base_rel = "gera_valor" if found and (not only_approved or approved) else "um_pouco_comum"
-
-            # competitividade
-            competitors_have = comp_count.get(key, 0)
-            parity = competitors_have >= 2
-            opportunity = competitors_have <= 1
-
-            if not found and not suggested_flag:
-                rec, prio = "avaliar", "baixa"
-            elif found and (approved or not only_approved):
-                if opportunity:   rec, prio = "proteger", "alta"
-                elif parity:      rec, prio = "manter", "média"
-                else:             rec, prio = "aprimorar", "média"
-            else:
-                # sugerido (sem evidência aprovada)
-                rec, prio = "avaliar", "baixa"
-
-            evidence = []
-            if a:
-                evidence.append({
-                    "quote": a.get("evidence",""),
-                    "source": a.get("source",""),
-                    "url": a.get("url",""),
-                    "captured_at": a.get("captured_at","")
-                })
-
-            grid.append({
-                "pillar": pillar,
-                "sub_benefit": sub,
-                "found": found,
-                "approved": approved,
-                "suggested": suggested_flag,
-                "usage_level": base_usage,
-                "relevance_level": base_rel,
-                "recommendation": rec,
-                "priority": prio,
-                "parity": parity,
-                "opportunity": opportunity,
-                "evidence": evidence
-            })
+    grid = m2_grid(idx, m2_codes(found, approved, suggested, parity, only_approved))
+    return m2_output(b.get("brand",""), grid, only_approved)
+
+M2_BATCH_MAX = int(os.environ.get("M2_BATCH_MAX", "1000"))
+
+def m2_batch_entries(b: Dict) -> List[Dict]:
+    entries = b.get("brands")
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        raise ValueError("brands deve ser uma lista de objetos")
+    if len(entries) > M2_BATCH_MAX:
+        raise ValueError(f"no máximo {M2_BATCH_MAX} marcas por lote")
+    return entries
+
+def run_m2_batch(b: Dict) -> Dict:
+    """
+    Espera:
+    {
+      "brands": [ {"brand":"...", "from_m1": {...} | "from_m1_id":"...",
+                   "approved":[...], "use_only_approved": true|false}, ... ],
+      "from_competitors": {...} | "from_competitors_id":"...",   # compartilhado por todas
+      "use_only_approved": true|false                            # padrão das marcas
+    }
+    Cada item de "brands" sai idêntico à M2 da mesma marca pela rota individual;
+    "comp_count" diz quantos competidores cobrem cada sub-benefício (ordem de mask_order).
+    """
+    entries = m2_batch_entries(b)
+    comp = (b.get("from_competitors") or {}).get("comparison") or []
+    masks = list(competitor_bits(comp))
+    parity = parity_mask(masks)
+    default_only = bool(b.get("use_only_approved", False))
+
+    inputs = [m2_inputs(e.get("from_m1") or {}, e.get("approved")) for e in entries]
+    only = [bool(e.get("use_only_approved", default_only)) for e in entries]
+    codes = m2_codes_batch([i[1] for i in inputs], [i[2] for i in inputs], [i[3] for i in inputs], parity, only)
+    return {
+        "stage": "diferenciais_batch",
+        "brands": [m2_output(e.get("brand",""), m2_grid(i[0], c), o) for e, i, c, o in zip(entries, inputs, codes, only)],
+        "comp_count": comp_counts(masks),
+        "mask_order": MASK_ORDER
+    }
+
+def run_m2_delta(b: Dict) -> Tuple[Dict, List[Dict]]:
+    """
+    Espera:
+    {
+      "brand":"...",
+      "from_m2": { "grid":[{...}], "use_only_approved": ... },   # ou "from_m2_id"
+      "changes": [{"pillar":"...","sub_benefit":"...","approved": true|false}],
+      "use_only_approved": true|false    # opcional; padrão = o da grade anterior
+    }
+    Recalcula só as linhas afetadas (todas, se use_only_approved mudar) a partir
+    do que a própria linha já guarda (found, suggested, parity). Devolve a M2
+    completa atualizada e a lista das linhas que mudaram.
+    """
+    prev = b.get("from_m2") or {}
+    prev_only = bool(prev.get("use_only_approved", False))
+    only_approved = bool(b.get("use_only_approved", prev_only))
+    changes = {(c.get("pillar",""), c.get("sub_benefit","")): bool(c.get("approved"))
+               for c in b.get("changes") or [] if isinstance(c, dict)}
+
+    grid, changed = [], []
+    for row in prev.get("grid") or []:
+        key = (row.get("pillar",""), row.get("sub_benefit",""))
+        if key in changes or only_approved != prev_only:
+            found = bool(row.get("found"))
+            # só há o que aprovar onde há evidência (como em apply_approvals na M1)
+            approved = found and changes.get(key, bool(row.get("approved")))
+            usage, rel, rec, prio = m2_levels(found, approved, bool(row.get("suggested")),
+                                              bool(row.get("parity")), only_approved)
+            new = {**row, "approved": approved, "usage_level": usage, "relevance_level": rel,
+                   "recommendation": rec, "priority": prio}
+            if new != row:
+                changed.append(new)
+                row = new
+        grid.append(row)
+
+    full = {k: v for k, v in prev.items() if k not in ("run_id", "stage_id")}
+    full.update(brand=b.get("brand", prev.get("brand","")), stage="diferenciais_matrix",
+                grid=grid, use_only_approved=only_approved)
+    return full, changed
+
+m2_bp = Blueprint("m2", __name__)
+
+@m2_bp.post("/m2-diferenciais")
+def m2_diferenciais():
+    return stage_view("m2", run_m2_diferenciais)
+
+@m2_bp.post("/m2-diferenciais/batch")
+def m2_batch():
+    """
+    M2 de várias marcas contra o mesmo conjunto de competidores. Cada marca é
+    guardada como uma M2 própria (run_id da marca ou da M1 referenciada), e o
+    stage_id dela serve como from_m2_id para a M3.
+    """
+    b = request_body()
+    try:
+        entries = m2_batch_entries(b)
+        runs.resolve(b)
+        run_ids = [runs.resolve(e) for e in entries]
+        out = run_m2_batch(b)
+    except runs.RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    bodies = []
+    for res, run_id in zip(out["brands"], run_ids):
+        runs.stamp(res, run_id)
+        bodies.append(current_app.json.dumpb(res))
+        runs.record(res, "m2", bodies[-1])
+    if wants_columnar():
+        for res in out["brands"]:
+            columnar(res, "m2")
+        resp = jsonify(out)
+        resp.vary.add("Accept")
+        return resp
+    # as M2 já serializadas entram como estão na resposta
+    meta = current_app.json.dumpb({k: v for k, v in out.items() if k != "brands"})
+    resp = Response(b'{"brands":[' + b",".join(bodies) + b"]," + meta[1:] + b"\n", mimetype="application/json")
+    resp.vary.add("Accept")
+    return resp
 
+@m2_bp.post("/m2-diferenciais/delta")
+def m2_delta():
+    """
+    Aplica mudanças de aprovação sobre uma M2 anterior e devolve só as linhas
+    alteradas. A M2 completa resultante é guardada: o stage_id da resposta serve
+    como from_m2_id para a M3 ou para o próximo delta.
+    """
+    b = request_body()
+    try:
+        run_id = runs.resolve(b)
+    except runs.RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    full, changed = run_m2_delta(b)
+    runs.stamp(full, run_id)
+    runs.record(full, "m2", current_app.json.dumpb(full))
     return jsonify({
-        "brand": brand,
-        "stage": "diferenciais_matrix",
-        "grid": grid,
-        "notes": "Sem invenção: aprovados conduzem; sugeridos ficam como avaliar."
+        "brand": full["brand"],
+        "stage": "diferenciais_delta",
+        "run_id": full["run_id"],
+        "stage_id": full["stage_id"],
+        "base_stage_id": b.get("from_m2_id") or (b.get("from_m2") or {}).get("stage_id"),
+        "use_only_approved": full["use_only_approved"],
+        "changed": changed
     }), 200
 
 # =========================
 # M3 — Decisão Estratégica (apenas aprovados; pendentes ficam sem quadrante)
 # =========================
-@app.post("/m3-decisao")
-def m3_decisao():
+def run_m3_decisao(b: Dict) -> Dict:
     """
     Espera:
     {
       "brand":"...",
-      "from_m2": { "grid":[{...}] }
+      "from_m2": { "grid":[{...}] }     # ou "from_m2_id": "..."
     }
     """
-    b = request.get_json(silent=True) or {}
     brand = b.get("brand","")
     grid = (b.get("from_m2") or {}).get("grid") or []
 
@@ -423,82 +1163,441 @@ def m3_decisao():
             "argument": arg
         })
 
-    return jsonify({
+    return {
         "brand": brand,
         "stage": "decisao_estrategica",
         "decisions": decisions
-    }), 200
+    }
+
+m3_bp = Blueprint("m3", __name__)
+
+@m3_bp.post("/m3-decisao")
+def m3_decisao():
+    return stage_view("m3", run_m3_decisao)
 
 # =========================
 # M4 — Detalhamento (marca gaps)
 # =========================
-@app.post("/m4-detalhamento")
-def m4_detalhamento():
+def m4_item(name) -> Tuple[Dict, Dict]:
+    """Esqueleto de um diferencial e a entrada dele em 'gaps'."""
+    item = {
+        "differential": name,
+        "porque": "",
+        "racional": "",
+        "emocional": "",
+        "tangivel": "",
+        "intangivel": "",
+        "positivo": "",
+        "negativo": "",
+        "card_em_discussao": name,
+        "observacao": ""
+    }
+    detail_gaps = [k for k,v in item.items() if k not in ["differential","card_em_discussao"] and not v]
+    return item, {"differential": name, "missing": detail_gaps}
+
+def run_m4_detalhamento(b: Dict) -> Dict:
     """
-    Espera: { "brand":"...", "from_m3": { "decisions":[...] } }
+    Espera: { "brand":"...", "from_m3": { "decisions":[...] } }   (ou "from_m3_id")
     Retorna esqueleto completo; onde não há evidência, marca em 'gaps'.
     """
-    b = request.get_json(silent=True) or {}
     brand = b.get("brand","")
     decisions = (b.get("from_m3") or {}).get("decisions") or []
 
     detailed, gaps = [], []
     for d in decisions:
-        name = f"{d.get('pillar','')}/{d.get('sub_benefit','')}"
-        item = {
-            "differential": name,
-            "porque": "",
-            "racional": "",
-            "emocional": "",
-            "tangivel": "",
-            "intangivel": "",
-            "positivo": "",
-            "negativo": "",
-            "card_em_discussao": name,
-            "observacao": ""
-        }
-        detail_gaps = [k for k,v in item.items() if k not in ["differential","card_em_discussao"] and not v]
+        item, gap = m4_item(f"{d.get('pillar','')}/{d.get('sub_benefit','')}")
         detailed.append(item)
-        gaps.append({"differential": name, "missing": detail_gaps})
+        gaps.append(gap)
 
-    return jsonify({
+    return {
         "brand": brand,
         "stage": "detalhamento",
         "detailed": detailed,
         "gaps": gaps,
         "notes": "Preencher com evidências aprovadas; nada de inferências."
-    }), 200
+    }
+
+m4_bp = Blueprint("m4", __name__)
+
+@m4_bp.post("/m4-detalhamento")
+def m4_detalhamento():
+    return stage_view("m4", run_m4_detalhamento)
 
 # =========================
 # M5 — Planejamento (Dizer/Mostrar/Fazer) — só aprovados
 # =========================
-@app.post("/m5-planejamento")
-def m5_planejamento():
+def m5_item(name) -> Dict:
+    return {
+        "differential": name,
+        "dizer":   {"o_que": "", "onde": [], "como": ""},
+        "mostrar": {"o_que": "", "onde": [], "como": ""},
+        "fazer":   {"o_que": "", "onde": [], "como": ""}
+    }
+
+def run_m5_planejamento(b: Dict) -> Dict:
     """
-    Espera: { "brand":"...", "from_m4": { "detailed":[...] } }
+    Espera: { "brand":"...", "from_m4": { "detailed":[...] } }   (ou "from_m4_id")
     Constrói placeholders de plano; campos vazios permanecem até serem preenchidos com base nas evidências aprovadas.
     """
-    b = request.get_json(silent=True) or {}
     brand = b.get("brand","")
     detailed = (b.get("from_m4") or {}).get("detailed") or []
 
-    plan = []
-    for d in detailed:
-        name = d.get("differential","")
-        plan.append({
-            "differential": name,
-            "dizer":   {"o_que": "", "onde": [], "como": ""},
-            "mostrar": {"o_que": "", "onde": [], "como": ""},
-            "fazer":   {"o_que": "", "onde": [], "como": ""}
-        })
+    plan = [m5_item(d.get("differential","")) for d in detailed]
 
-    return jsonify({
+    return {
         "brand": brand,
         "stage": "planejamento",
         "plan": plan,
         "notes": "Completar com mensagens, canais e ações baseadas apenas em aprovados."
-    }), 200
+    }
+
+m5_bp = Blueprint("m5", __name__)
+
+@m5_bp.post("/m5-planejamento")
+def m5_planejamento():
+    return stage_view("m5", run_m5_planejamento)
+
+# =========================
+# M4/M5 pré-serializadas: o esqueleto de cada item sai do provedor JSON do app uma
+# vez só (com marcadores no lugar dos campos variáveis); por item, só o nome do
+# diferencial é codificado. Os bytes são os mesmos do dumps da saída em dicts.
+# =========================
+def _slot(name: str) -> str:
+    return f"\ue000{name}\ue000"
+
+class JSONTemplate:
+    """JSON de um objeto com marcadores _slot(nome), partido nos pontos onde eles caem."""
+
+    def __init__(self, provider, obj, slots):
+        text = provider.dumps(obj)
+        tokens = {provider.dumps(_slot(s)): s for s in slots}
+        self.parts, self.slots, pos = [], [], 0
+        for m in re.finditer("|".join(map(re.escape, tokens)), text):
+            self.parts.append(text[pos:m.start()].encode())
+            self.slots.append(tokens[m.group()])
+            pos = m.end()
+        self.parts.append(text[pos:].encode())
+
+    def render(self, **values: bytes) -> bytes:
+        out = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            out += (values[slot], part)
+        return b"".join(out)
+
+class StageTemplates:
+    """Modelos da M4/M5 para um provedor JSON (o separador de arrays e o escape vêm dele)."""
+
+    def __init__(self, provider):
+        self.provider, self.quote = provider, provider.quote
+        self.sep = provider.dumps([0, 0])[1:-1].replace("0", "").encode()
+        ids = {"run_id": _slot("run_id"), "stage_id": _slot("stage_id")}
+        top = ("brand", "run_id", "stage_id")
+        self.m4 = JSONTemplate(provider, {**run_m4_detalhamento({"brand": _slot("brand")}),
+                                          "detailed": _slot("detailed"), "gaps": _slot("gaps"), **ids},
+                               top + ("detailed", "gaps"))
+        item, gap = m4_item(_slot("name"))
+        self.m4_item = JSONTemplate(provider, item, ("name",)).parts
+        self.m4_gap = JSONTemplate(provider, gap, ("name",)).parts
+        self.m5 = JSONTemplate(provider, {**run_m5_planejamento({"brand": _slot("brand")}),
+                                          "plan": _slot("plan"), **ids}, top + ("plan",))
+        self.m5_item = JSONTemplate(provider, m5_item(_slot("name")), ("name",)).parts
+
+    def value(self, v) -> bytes:
+        return self.quote(v).encode()
+
+    def array(self, items: List[bytes]) -> bytes:
+        return b"[" + self.sep.join(items) + b"]"
+
+_TEMPLATES = {}
+
+def stage_templates() -> StageTemplates:
+    provider = current_app.json
+    t = _TEMPLATES.get(provider)
+    if t is None:
+        t = _TEMPLATES[provider] = StageTemplates(provider)
+    return t
+
+def encode_m4(b: Dict, ids: Dict) -> bytes:
+    t = stage_templates()
+    t0 = time.perf_counter()
+    quote, item, gap = t.quote, t.m4_item, t.m4_gap
+    detailed, gaps = [], []
+    for d in (b.get("from_m3") or {}).get("decisions") or []:
+        name = quote(f"{d.get('pillar','')}/{d.get('sub_benefit','')}").encode()
+        detailed.append(name.join(item))
+        gaps.append(name.join(gap))
+    body = t.m4.render(brand=t.value(b.get("brand","")), detailed=t.array(detailed), gaps=t.array(gaps),
+                       run_id=t.value(ids["run_id"]), stage_id=t.value(ids["stage_id"]))
+    if metrics.CLOCK.active:
+        metrics.CLOCK.json_dumps += time.perf_counter() - t0
+    return body
+
+def encode_m5(b: Dict, ids: Dict) -> bytes:
+    t = stage_templates()
+    t0 = time.perf_counter()
+    quote, item = t.quote, t.m5_item
+    plan = [quote(d.get("differential","")).encode().join(item) for d in (b.get("from_m4") or {}).get("detailed") or []]
+    body = t.m5.render(brand=t.value(b.get("brand","")), plan=t.array(plan),
+                       run_id=t.value(ids["run_id"]), stage_id=t.value(ids["stage_id"]))
+    if metrics.CLOCK.active:
+        metrics.CLOCK.json_dumps += time.perf_counter() - t0
+    return body
+
+STAGE_ENCODERS = {"m4": encode_m4, "m5": encode_m5}
+
+# =========================
+# Pipeline — M0 → M5 numa única chamada, em processo
+# =========================
+PIPELINE_STAGES = ("m0", "m0b", "m1", "m2", "m3", "m4", "m5")
+
+def apply_approvals(m1: Dict, approvals) -> Dict:
+    """Marca approved=True nos atributos da M1 cujos (pillar, sub_benefit) foram aprovados."""
+    keys = {((a or {}).get("pillar",""), (a or {}).get("sub_benefit","")) for a in approvals or []}
+    for row in m1.get("attributes") or []:
+        if (row.get("pillar"), row.get("sub_benefit")) in keys:
+            row["approved"] = True
+    return m1
+
+def run_pipeline(b: Dict) -> Dict:
+    """
+    Espera:
+    {
+      "brand":"...", "category":"...", "scope":"...",
+      "findings":[...],                  # como na M0
+      "competitors_findings":[...],      # opcional, como na M0b
+      "suggestions":[...],               # opcional, como na M1
+      "approved":[{"pillar":"...","sub_benefit":"..."}],
+      "use_only_approved": true|false,
+      "dedup": true, "dedup_threshold": 0.8,   # opcional, como na M0/M0b
+      "stages":["m1","m2"]               # opcional; padrão = todas
+    }
+    Roda só até a última etapa pedida e devolve apenas as etapas pedidas.
+    """
+    brand = b.get("brand",""); category = b.get("category","")
+    wanted = b.get("stages") or list(PIPELINE_STAGES)
+    unknown = [s for s in wanted if s not in PIPELINE_STAGES]
+    if unknown:
+        raise ValueError(f"etapas desconhecidas: {', '.join(map(str, unknown))}")
+    last = max(PIPELINE_STAGES.index(s) for s in wanted)
+
+    out = {}
+    dedup_opts = {k: b[k] for k in ("dedup", "dedup_threshold") if k in b}
+    out["m0"] = run_m0_pesquisa({"brand": brand, "category": category, "findings": b.get("findings"), **dedup_opts})
+    if last >= 1:
+        out["m0b"] = run_m0_competidores({"brand": brand, "category": category, **dedup_opts,
+                                          "competitors_findings": b.get("competitors_findings")})
+    if last >= 2:
+        out["m1"] = apply_approvals(run_m1_beneficios({"brand": brand, "scope": b.get("scope",""), "category": category,
+                                                       "evidence": out["m0"]["evidence"],
+                                                       "suggestions": b.get("suggestions")}),
+                                    b.get("approved"))
+    if last >= 3:
+        out["m2"] = run_m2_diferenciais({"brand": brand, "from_m1": out["m1"],
+                                         "use_only_approved": b.get("use_only_approved", False),
+                                         "from_competitors": out["m0b"]})
+    if last >= 4:
+        out["m3"] = run_m3_decisao({"brand": brand, "from_m2": out["m2"]})
+    if last >= 5:
+        out["m4"] = run_m4_detalhamento({"brand": brand, "from_m3": out["m3"]})
+    if last >= 6:
+        out["m5"] = run_m5_planejamento({"brand": brand, "from_m4": out["m4"]})
+
+    return {
+        "brand": brand,
+        "stage": "pipeline",
+        "stages": {s: out[s] for s in PIPELINE_STAGES if s in wanted}
+    }
+
+pipeline_bp = Blueprint("pipeline", __name__)
+
+PIPELINE_STREAM = {"findings": m0_finding, "competitors_findings": m0b_entry}
+
+def record_pipeline(out: Dict, run_id) -> Dict:
+    """Carimba e guarda cada etapa do pipeline sob o mesmo run_id."""
+    out["run_id"] = run_id or runs.new_id()
+    for stage, res in out["stages"].items():
+        runs.stamp(res, out["run_id"])
+        runs.record(res, stage, current_app.json.dumpb(res))
+    return out
+
+def pipeline_response(out: Dict):
+    if wants_columnar():
+        for stage, res in out["stages"].items():
+            if stage in COLUMNAR_FIELDS:
+                columnar(res, stage)
+    resp = jsonify(out)
+    resp.vary.add("Accept")
+    return resp, 200
+
+@pipeline_bp.post("/pipeline")
+def pipeline():
+    b = request_body(PIPELINE_STREAM)
+    try:
+        out = run_pipeline(b)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return pipeline_response(record_pipeline(out, b.get("run_id")))
+
+# =========================
+# Jobs assíncronos — M0, M0b e pipeline fora da thread da requisição
+# =========================
+# rota do job → (etapa, função, arrays lidos em fluxo)
+JOB_KINDS = {
+    "m0-pesquisa": ("m0", run_m0_pesquisa, {"findings": m0_finding}),
+    "m0-competidores": ("m0b", run_m0_competidores, {"competitors_findings": m0b_entry}),
+    "pipeline": ("pipeline", run_pipeline, PIPELINE_STREAM),
+}
+JOBS = jobs.JobQueue()
+
+def run_job(app: Flask, stage: str, fn, b: Dict, run_id) -> Tuple[int, bytes]:
+    """Corpo do job (thread do executor): (status HTTP, JSON) como a rota síncrona devolveria."""
+    with app.app_context():
+        try:
+            if stage == "pipeline":
+                return 200, app.json.dumpb(record_pipeline(fn(b), run_id))
+            return 200, run_stage(stage, fn, b, run_id)[1]
+        except ValueError as e:
+            return 400, app.json.dumpb({"error": str(e)})
+
+def job_status(job: Dict) -> Dict:
+    out = {k: job[k] for k in ("job_id", "kind", "status", "created", "updated")}
+    out["result_url"] = f"/jobs/{job['job_id']}/result"
+    if job["status"] in jobs.PENDING:
+        out["retry_after"] = JOBS.retry_after()
+    else:
+        out["http_status"] = job["http_status"]
+    return out
+
+def job_pending(job: Dict):
+    resp = jsonify(job_status(job))
+    resp.status_code = 202
+    resp.headers["Retry-After"] = str(JOBS.retry_after())
+    return resp
+
+jobs_bp = Blueprint("jobs", __name__)
+
+@jobs_bp.post("/jobs/<kind>")
+def job_submit(kind):
+    """
+    Mesmo corpo da rota síncrona (/m0-pesquisa, /m0-competidores, /pipeline).
+    202 com o job_id; 429 + Retry-After com a fila cheia; 404 se uma referência *_id não existe.
+    """
+    if kind not in JOB_KINDS:
+        return jsonify({"error": f"tipo de job desconhecido: {kind}", "kinds": list(JOB_KINDS)}), 404
+    stage, fn, stream_arrays = JOB_KINDS[kind]
+    b = request_body(stream_arrays)
+    try:
+        run_id = runs.resolve(b)
+    except runs.RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    try:
+        job_id = JOBS.submit(kind, partial(run_job, current_app._get_current_object(), stage, fn, b, run_id))
+    except jobs.QueueFull as e:
+        resp = jsonify({"error": str(e), "retry_after": e.retry_after})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+    resp = job_pending(JOBS.get(job_id))
+    resp.headers["Location"] = f"/jobs/{job_id}"
+    return resp
+
+@jobs_bp.get("/jobs/<job_id>")
+def job_get(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": f"job '{job_id}' não encontrado ou expirado"}), 404
+    return jsonify(job_status(job)), 200
+
+@jobs_bp.get("/jobs/<job_id>/result")
+def job_result(job_id):
+    """Resultado com o status HTTP da rota síncrona; 202 + Retry-After enquanto não terminou."""
+    job = JOBS.get(job_id, with_body=True)
+    if job is None:
+        return jsonify({"error": f"job '{job_id}' não encontrado ou expirado"}), 404
+    if job["status"] in jobs.PENDING:
+        return job_pending(job)
+    stage = JOB_KINDS[job["kind"]][0]
+    if job["http_status"] == 200 and wants_columnar():
+        out = current_app.json.loads(job["body"])
+        return pipeline_response(out) if stage == "pipeline" else stage_response(out, stage)
+    resp = Response(job["body"] + b"\n", status=job["http_status"], mimetype="application/json")
+    resp.vary.add("Accept")
+    return resp
+
+# =========================
+# App
+# =========================
+BLUEPRINTS = (ops_bp, m0_bp, m0b_bp, m1_bp, m2_bp, m3_bp, m4_bp, m5_bp, pipeline_bp, jobs_bp)
+
+SELF_TEST_FINDINGS = [
+    {"text": "Peça pelo WhatsApp e pague com Pix", "source_type": "website", "source_name": "Site"},
+    {"text": "Massa de longa fermentação no forno a lenha", "source_type": "instagram", "source_name": "IG"},
+]
+
+def _self_test(client, path, body, expect):
+    kwargs = {"data": body, "content_type": "application/x-ndjson"} if isinstance(body, bytes) else {"json": body}
+    r = client.post(path, **kwargs)
+    out = r.get_data() if isinstance(body, bytes) else r.get_json(silent=True)
+    if r.status_code != 200 or not out or (expect and not out.get(expect)):
+        raise RuntimeError(f"self-test falhou em {path}: HTTP {r.status_code}")
+    return out
+
+def _self_test_job(client, path, body, expect, timeout: float = 30.0):
+    r = client.post(path, json=body)
+    if r.status_code != 202:
+        raise RuntimeError(f"self-test falhou em {path}: HTTP {r.status_code}")
+    result, deadline = r.get_json()["result_url"], time.monotonic() + timeout
+    while (r := client.get(result)).status_code == 202 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    out = r.get_json(silent=True)
+    if r.status_code != 200 or not out or not out.get(expect):
+        raise RuntimeError(f"self-test falhou em {result}: HTTP {r.status_code}")
+    return out
+
+def warm_up(app: Flask):
+    """
+    Compila as tabelas de palavras-chave e passa uma requisição por cada etapa antes
+    de o worker receber tráfego. Falha no boot (RuntimeError) se alguma etapa quebrar.
+    """
+    reload_keywords()
+    app.config["METRICS"] = False  # o self-test não entra nas métricas
+    c = app.test_client()
+    m0 = _self_test(c, "/m0-pesquisa", {"brand": "self-test", "findings": SELF_TEST_FINDINGS}, "evidence")
+    m0b = _self_test(c, "/m0-competidores", {"brand": "self-test", "competitors_findings": [
+        {"competitor": "self-test", "findings": SELF_TEST_FINDINGS}]}, "comparison")
+    # daqui em diante, encadeado pelas referências *_id: o corpo de cada etapa fica
+    # pequeno e o self-test não depende dos BODY_LIMITS de cada rota
+    m1 = _self_test(c, "/m1-beneficios", {"brand": "self-test", "from_m0_id": m0["stage_id"]}, "attributes")
+    approved = [{"pillar": a["pillar"], "sub_benefit": a["sub_benefit"]} for a in m1["attributes"]]
+    m2 = _self_test(c, "/m2-diferenciais", {"brand": "self-test", "from_m1_id": m1["stage_id"],
+                                            "from_competitors_id": m0b["stage_id"], "approved": approved}, "grid")
+    _self_test(c, "/m2-diferenciais/delta", {"brand": "self-test", "from_m2_id": m2["stage_id"], "changes": [
+        {**approved[0], "approved": False}]}, "changed")
+    m3 = _self_test(c, "/m3-decisao", {"brand": "self-test", "from_m2_id": m2["stage_id"]}, "decisions")
+    m4 = _self_test(c, "/m4-detalhamento", {"brand": "self-test", "from_m3_id": m3["stage_id"]}, "detailed")
+    _self_test(c, "/m5-planejamento", {"brand": "self-test", "from_m4_id": m4["stage_id"]}, "plan")
+    _self_test(c, "/pipeline", {"brand": "self-test", "findings": SELF_TEST_FINDINGS}, "stages")
+    _self_test(c, "/classify-stream", "".join(app.json.dumps(f) + "\n" for f in SELF_TEST_FINDINGS).encode(), None)
+    _self_test_job(c, "/jobs/m0-pesquisa", {"brand": "self-test", "findings": SELF_TEST_FINDINGS}, "evidence")
+    app.config["METRICS"] = True
+    reload_keywords()  # descarta o que o self-test deixou no cache e nas estatísticas
+    RESPONSES.clear()
+    JOBS.shutdown()  # com --preload, o master não leva threads de job para o fork
+
+def create_app(warmup: bool = True) -> Flask:
+    app = Flask(__name__)
+    app.request_class = LimitedRequest
+    app.config["MAX_BODY_BYTES"], app.config["BODY_LIMITS"] = body_limits_from_env()
+    app.register_error_handler(RequestEntityTooLarge, body_too_large)
+    metrics.init_app(app, jsonprovider.provider_class())
+    compression.init_app(app)
+    profiling.init_app(app)
+    for bp in BLUEPRINTS:
+        app.register_blueprint(bp)
+    if warmup:
+        warm_up(app)
+    return app
 
 # Local
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=10000)
+    create_app().run(host="0.0.0.0", port=10000)
@@ -0,0 +1,177 @@
+"""
+Métricas Prometheus do serviço (GET /metrics).
+
+Com PROMETHEUS_MULTIPROC_DIR definido (gunicorn.conf.py faz isso) cada worker
+grava seus valores em arquivos mmap nesse diretório e o /metrics agrega todos
+os processos; sem a variável, vale o registro do próprio processo.
+"""
+import functools
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, request
+from flask.json.provider import DefaultJSONProvider
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(2 ** p for p in range(8, 29, 2))            # 256 B … 256 MB
+ITEM_BUCKETS = (0, 1, 10, 30, 100, 300, 1000, 3000, 10_000, 30_000, 100_000, 300_000)
+
+REQUESTS = Counter("brand_matrix_requests_total", "Requisições por rota", ["route", "method", "status"])
+LATENCY = Histogram("brand_matrix_request_duration_seconds", "Latência da view (até a resposta ficar pronta)",
+                    ["route"], buckets=LATENCY_BUCKETS)
+REQUEST_SIZE = Histogram("brand_matrix_request_size_bytes", "Tamanho do corpo da requisição",
+                         ["route"], buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("brand_matrix_response_size_bytes", "Tamanho do corpo da resposta",
+                          ["route"], buckets=SIZE_BUCKETS)
+ITEMS = Histogram("brand_matrix_evidence_items", "Itens de evidência/entrada por chamada",
+                  ["route"], buckets=ITEM_BUCKETS)
+CLASSIFY_TIME = Histogram("brand_matrix_classify_seconds", "Tempo dentro de classify_snippet por requisição",
+                          ["route"], buckets=LATENCY_BUCKETS)
+RESPONSE_CACHE = Counter("brand_matrix_response_cache_total", "Consultas ao cache de respostas por nível que respondeu",
+                         ["route", "result"])
+JSON_TIME = Histogram("brand_matrix_json_seconds", "Tempo de (de)serialização JSON por requisição",
+                      ["route", "op"], buckets=LATENCY_BUCKETS)
+
+class _Clock(threading.local):
+    """Acumuladores por thread, ligados só durante uma requisição instrumentada."""
+    active = False
+    classify = 0.0
+    json_dumps = 0.0
+    json_loads = 0.0
+
+CLOCK = _Clock()
+
+def _len(v):
+    return len(v) if isinstance(v, (list, dict)) else 0
+
+def _sub(b, key, inner):
+    v = b.get(key)
+    return v.get(inner) if isinstance(v, dict) else None
+
+# quantos itens cada rota recebeu (a partir do corpo já parseado)
+ITEM_COUNTERS = {
+    "/m0-pesquisa": lambda b: _len(b.get("findings")),
+    "/m0-competidores": lambda b: sum(_len((c or {}).get("findings")) for c in b.get("competitors_findings") or []
+                                      if isinstance(c, dict)),
+    "/m1-beneficios": lambda b: _len(b.get("evidence")) + _len(b.get("suggestions")),
+    "/m2-diferenciais": lambda b: _len(_sub(b, "from_m1", "attributes")) + _len(_sub(b, "from_m1", "suggested")),
+    "/m2-diferenciais/delta": lambda b: _len(b.get("changes")),
+    "/m2-diferenciais/batch": lambda b: sum(ITEM_COUNTERS["/m2-diferenciais"](e) for e in b.get("brands") or []
+                                            if isinstance(e, dict)),
+    "/m3-decisao": lambda b: _len(_sub(b, "from_m2", "grid")),
+    "/m4-detalhamento": lambda b: _len(_sub(b, "from_m3", "decisions")),
+    "/m5-planejamento": lambda b: _len(_sub(b, "from_m4", "detailed")),
+    "/pipeline": lambda b: _len(b.get("findings")) + ITEM_COUNTERS["/m0-competidores"](b),
+    # job assíncrono: conta como a rota síncrona do mesmo tipo
+    "/jobs/<kind>": lambda b: ITEM_COUNTERS.get("/" + request.view_args.get("kind", ""), _len)(b),
+}
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Soma no CLOCK da requisição o tempo do provedor JSON que vem depois dele no MRO (timed_provider)."""
+
+    def dumps(self, obj, **kwargs):
+        if not CLOCK.active:
+            return super().dumps(obj, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            CLOCK.json_dumps += time.perf_counter() - t0
+
+    def dumpb(self, obj, *args):
+        if not CLOCK.active:
+            return super().dumpb(obj, *args)
+        t0 = time.perf_counter()
+        try:
+            return super().dumpb(obj, *args)
+        finally:
+            CLOCK.json_dumps += time.perf_counter() - t0
+
+    def loads(self, s, **kwargs):
+        if not CLOCK.active:
+            return super().loads(s, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return super().loads(s, **kwargs)
+        finally:
+            CLOCK.json_loads += time.perf_counter() - t0
+
+def timed_provider(cls):
+    """Subclasse de cls (um DefaultJSONProvider com dumpb) que mede o tempo de (de)serialização."""
+    return type(f"Timed{cls.__name__}", (TimedJSONProvider, cls), {})
+
+def timed_classify(fn):
+    """
+    Envolve o classificador para somar o tempo no CLOCK quando há requisição medida.
+    Chamadas feitas nos pools da M0b (outras threads/processos) não entram na conta.
+    """
+    @functools.wraps(fn)
+    def classify(*args, **kwargs):
+        if not CLOCK.active:
+            return fn(*args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            CLOCK.classify += time.perf_counter() - t0
+    return classify
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+def _before():
+    if request.path == "/metrics" or not current_app.config.get("METRICS", True):
+        return
+    CLOCK.active = True
+    CLOCK.classify = CLOCK.json_dumps = CLOCK.json_loads = 0.0
+    g.metrics_t0 = time.perf_counter()
+
+def _after(response):
+    t0 = g.pop("metrics_t0", None)
+    if t0 is None:
+        return response
+    CLOCK.active = False
+    route = _route()
+    LATENCY.labels(route).observe(time.perf_counter() - t0)
+    REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    if request.content_length is not None:
+        REQUEST_SIZE.labels(route).observe(request.content_length)
+    if response.content_length is not None and not response.is_streamed:
+        RESPONSE_SIZE.labels(route).observe(response.content_length)
+    counter = ITEM_COUNTERS.get(route)
+    if counter and request.is_json and response.status_code < 400:
+        # o corpo que a view já leu (request_body); acerto do cache pelos bytes crus não parseia
+        body = g.get("request_body")
+        if isinstance(body, dict):
+            ITEMS.labels(route).observe(counter(body))
+    if "response_cache" in g:
+        RESPONSE_CACHE.labels(route, g.response_cache).inc()
+    if CLOCK.classify:
+        CLASSIFY_TIME.labels(route).observe(CLOCK.classify)
+    JSON_TIME.labels(route, "loads").observe(CLOCK.json_loads)
+    JSON_TIME.labels(route, "dumps").observe(CLOCK.json_dumps)
+    return response
+
+def _teardown(exc):
+    CLOCK.active = False
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.get("/metrics")
+def metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app, provider_cls):
+    app.json = timed_provider(provider_cls)(app)
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    app.register_blueprint(metrics_bp)
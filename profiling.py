@@ -0,0 +1,108 @@
+"""
+Profiling por requisição, opt-in.
+
+Ligado só com PROFILE_DIR definido (sem ele os hooks nem são registrados) e
+pedido por requisição com o cabeçalho X-Profile (igual a PROFILE_TOKEN, se
+houver). A requisição roda sob o cProfile; o .prof vai para PROFILE_DIR
+(abre com pstats/snakeviz) e a resposta leva Server-Timing com as fases
+medidas pelo CLOCK das métricas: parse do JSON, classificação, serialização
+e o resto da view.
+"""
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from flask import current_app, g, request
+
+import metrics
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")          # vazio: desligado
+PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")      # se definido, o cabeçalho tem de trazer este valor
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))  # .prof mantidos no diretório
+
+log = logging.getLogger(__name__)
+
+# um profiler por vez no processo (o cProfile é por thread e, a partir do 3.12, exclusivo)
+_busy = threading.Lock()
+
+def _wanted() -> bool:
+    value = request.headers.get(current_app.config["PROFILE_HEADER"])
+    if not value:
+        return False
+    token = current_app.config["PROFILE_TOKEN"]
+    return value == token if token else value.lower() not in ("0", "false", "no")
+
+def _before():
+    if not _wanted():
+        return
+    if not metrics.CLOCK.active:  # métricas desligadas (ex.: warm-up): liga o CLOCK só para esta requisição
+        metrics.CLOCK.active = True
+        metrics.CLOCK.classify = metrics.CLOCK.json_dumps = metrics.CLOCK.json_loads = 0.0
+    g.profile_t0 = time.perf_counter()
+    if _busy.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def _slug(route: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9]+", "-", route).strip("-") or "root"
+
+def _dump(profiler: cProfile.Profile) -> str:
+    folder = current_app.config["PROFILE_DIR"]
+    os.makedirs(folder, exist_ok=True)
+    route = request.url_rule.rule if request.url_rule else request.path
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{_slug(route)}-{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(os.path.join(folder, name))
+    old = sorted(f for f in os.listdir(folder) if f.endswith(".prof"))
+    for f in old[:max(0, len(old) - PROFILE_KEEP)]:
+        try:
+            os.remove(os.path.join(folder, f))
+        except OSError:
+            pass
+    return name
+
+def server_timing(total: float) -> str:
+    """Fases em ms no formato do Server-Timing; "view" é o que sobra (regras, montagem da grade...)."""
+    c = metrics.CLOCK
+    phases = {"json-loads": c.json_loads, "classify": c.classify, "json-dumps": c.json_dumps}
+    phases["view"] = max(0.0, total - sum(phases.values()))
+    phases["total"] = total
+    return ", ".join(f"{name};dur={sec * 1000:.2f}" for name, sec in phases.items())
+
+def _after(response):
+    t0 = g.pop("profile_t0", None)
+    if t0 is None:
+        return response
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _busy.release()
+        try:
+            response.headers["X-Profile-File"] = _dump(profiler)
+        except OSError as e:
+            log.warning("não foi possível gravar o profile: %s", e)
+    else:
+        response.headers["X-Profile-File"] = "ocupado"  # outro profiling em andamento: só o Server-Timing
+    response.headers["Server-Timing"] = server_timing(time.perf_counter() - t0)
+    return response
+
+def _teardown(exc):
+    # exceção não tratada: o after_request não roda, mas o profiler precisa parar
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _busy.release()
+
+def init_app(app):
+    app.config.setdefault("PROFILE_DIR", PROFILE_DIR)
+    app.config.setdefault("PROFILE_HEADER", PROFILE_HEADER)
+    app.config.setdefault("PROFILE_TOKEN", PROFILE_TOKEN)
+    if not app.config["PROFILE_DIR"]:
+        return
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
@@ -0,0 +1,194 @@
+"""
+Cache de respostas das etapas determinísticas (M2–M5), pela hash canônica do corpo.
+
+Dois níveis: a memória do worker (LRU limitado em bytes) e, opcional, um SQLite
+local compartilhado pelos workers (RESPONSE_CACHE_PATH), FIFO limitado em bytes.
+Guarda os bytes da resposta já carimbada e o ETag: o mesmo corpo recebe a mesma
+resposta, com o mesmo run_id/stage_id (repetir a chamada é idempotente). A
+validade não passa do TTL do armazém de execuções, mas o armazém também despeja
+pelo limite em bytes: quem chama confere o acerto (valid em find) e, se o
+stage_id guardado já não resolve, trata como miss e guarda a resposta nova.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import runs
+
+MB = 1024 * 1024
+RESPONSE_CACHE_MB = float(os.environ.get("RESPONSE_CACHE_MB", "64"))            # por worker; 0 desliga
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "")                 # vazio: sem nível em disco
+RESPONSE_CACHE_DISK_MB = float(os.environ.get("RESPONSE_CACHE_DISK_MB", "512"))
+RESPONSE_CACHE_TTL = min(int(os.environ.get("RESPONSE_CACHE_TTL", str(runs.RUN_STORE_TTL))), runs.RUN_STORE_TTL)
+RAW_ALIASES = 4096  # hash dos bytes crus → chave canônica, por worker
+
+def _hash(salt: str, stage: str, data: bytes) -> str:
+    h = hashlib.blake2b(f"{salt}\0{stage}\0".encode(), digest_size=16)
+    h.update(data)
+    return h.hexdigest()
+
+def body_key(salt: str, stage: str, body) -> str:
+    """Hash do corpo já parseado, independente de ordem de chaves e espaços."""
+    return _hash(salt, stage, json.dumps(body, sort_keys=True, separators=(",", ":")).encode())
+
+def etag_of(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+class MemoryTier:
+    """LRU limitado pela soma dos tamanhos das respostas."""
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes, self.ttl = max(0, int(max_bytes)), ttl
+        self._data = OrderedDict()   # chave → (criado, etag, corpo)
+        self._lock = threading.Lock()
+        self.size = self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if time.time() - item[0] > self.ttl:
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return item[1], item[2]
+
+    def put(self, key: str, etag: str, body: bytes, created: float = None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (created or time.time(), etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self.size -= len(self._data.pop(key)[2])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions}
+
+class DiskTier(runs.SQLiteStore):
+    """SQLite local compartilhado pelos workers (WAL); sai primeiro o mais antigo."""
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL NOT NULL, "
+              "etag TEXT NOT NULL, size INTEGER NOT NULL, body BLOB NOT NULL)",
+              "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+    TABLE, KEY = "responses", "key"
+
+    def __init__(self, path: str, max_bytes: int, ttl: int):
+        super().__init__(path, ttl, max_bytes)
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes, float]]:
+        row = self._conn().execute("SELECT etag, body, created FROM responses WHERE key = ? AND created >= ?",
+                                   (key, time.time() - self.ttl)).fetchone()
+        return (row[0], row[1], row[2]) if row else None
+
+    def put(self, key: str, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, now, etag, len(body), body))
+        self._purge(conn, now)
+        self._evict(conn)
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"path": self.path, "entries": entries, "bytes": self._bytes(conn), "max_bytes": self.max_bytes}
+
+class ResponseCache:
+    def __init__(self, salt: str, memory_bytes: int = RESPONSE_CACHE_MB * MB, disk_path: str = RESPONSE_CACHE_PATH,
+                 disk_bytes: int = RESPONSE_CACHE_DISK_MB * MB, ttl: int = RESPONSE_CACHE_TTL):
+        self.salt = salt
+        self.memory = MemoryTier(memory_bytes, ttl)
+        self.disk = DiskTier(disk_path, disk_bytes, ttl) if disk_path else None
+        self._lock = threading.Lock()
+        self._aliases = OrderedDict()
+        self.counts = {"memory": 0, "disk": 0, "miss": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.memory.max_bytes or self.disk)
+
+    def key(self, stage: str, body) -> str:
+        return body_key(self.salt, stage, body)
+
+    def _get(self, key: str) -> Tuple[Optional[Tuple[str, bytes]], str]:
+        hit = self.memory.get(key)
+        if hit is not None:
+            return hit, "memory"
+        row = self.disk.get(key) if self.disk else None
+        if row:
+            self.memory.put(key, row[0], row[1], created=row[2])
+            return row[:2], "disk"
+        return None, "miss"
+
+    def _checked(self, key: str, valid) -> Tuple[Optional[Tuple[str, bytes]], str]:
+        hit, tier = self._get(key)
+        if hit is not None and valid is not None and not valid(hit[1]):
+            return None, "miss"
+        return hit, tier
+
+    def find(self, stage: str, data: bytes, parse: Callable[[], Dict],
+             valid: Optional[Callable[[bytes], bool]] = None):
+        """
+        (chave, (etag, corpo) ou None, nível que respondeu, corpo parseado ou None).
+        Tenta antes pelos bytes crus (retentativa idêntica: nem parseia o corpo);
+        senão parseia com parse() e procura pela hash canônica. Acerto cujo corpo
+        não passa em valid() conta como miss.
+        """
+        raw = _hash(self.salt, stage, data)
+        with self._lock:
+            key = self._aliases.get(raw)
+        hit, tier, body = None, "miss", None
+        if key:
+            hit, tier = self._checked(key, valid)
+        if hit is None:
+            body = parse()
+            key = self.key(stage, body)
+            hit, tier = self._checked(key, valid)
+        with self._lock:
+            self._aliases[raw] = key
+            self._aliases.move_to_end(raw)
+            if len(self._aliases) > RAW_ALIASES:
+                self._aliases.popitem(last=False)
+            self.counts[tier] += 1
+        return key, hit, tier, body
+
+    def put(self, key: str, body: bytes) -> str:
+        etag = etag_of(body)
+        self.memory.put(key, etag, body)
+        if self.disk:
+            self.disk.put(key, etag, body)
+        return etag
+
+    def clear(self):
+        """Esvazia a memória e zera os contadores (o nível em disco é compartilhado e fica)."""
+        self.memory.clear()
+        with self._lock:
+            self._aliases.clear()
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {**counts, "hit_rate": round((total - counts["miss"]) / total, 4) if total else 0.0,
+                "ttl": self.memory.ttl, "memory_tier": self.memory.stats(),
+                "disk_tier": self.disk.stats() if self.disk else None}
@@ -0,0 +1,195 @@
+"""
+Armazém local das saídas de cada etapa, para que as etapas seguintes as
+referenciem por ID (from_m1_id, ...) em vez de reenviar o payload inteiro.
+
+SQLite num arquivo compartilhado pelos workers (WAL), com TTL e limite em bytes
+(sai primeiro a saída mais antiga). Guarda o mesmo JSON que foi enviado na
+resposta, sem serializar de novo.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH") or os.path.join(tempfile.gettempdir(), "brand-matrix-runs.sqlite3")
+RUN_STORE_TTL = int(os.environ.get("RUN_STORE_TTL", "86400"))  # segundos
+RUN_STORE_MAX_MB = float(os.environ.get("RUN_STORE_MAX_MB", "1024"))  # acima disso saem as saídas mais antigas
+
+# referência aceita no corpo → (campo inline que ela preenche, etapa de origem);
+# a ordem decide de qual etapa referenciada o run_id é herdado
+REFERENCES = {
+    "from_m0_id": ("evidence", "m0"),               # M1: evidence normalizada da M0
+    "from_m1_id": ("from_m1", "m1"),
+    "from_m2_id": ("from_m2", "m2"),
+    "from_m3_id": ("from_m3", "m3"),
+    "from_m4_id": ("from_m4", "m4"),
+    "from_competitors_id": ("from_competitors", "m0b"),
+}
+
+class RunNotFound(LookupError):
+    pass
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+class SQLiteStore:
+    """
+    Base dos armazéns em SQLite local compartilhado pelos workers (WAL): uma
+    conexão por thread (refeita no processo filho depois do fork), o esquema da
+    subclasse (SCHEMA), a limpeza periódica do que passou do TTL e o despejo do
+    mais antigo quando passa do limite em bytes. TABLE precisa das colunas
+    created, KEY e body.
+
+    O total em bytes (length(body); NULL não conta) fica numa linha de
+    store_bytes mantida por triggers, exata para todos os workers e inclusive
+    na limpeza do TTL: conferir o limite é uma leitura por chave primária, e a
+    tabela só é percorrida quando há o que despejar.
+    """
+    PURGE_EVERY = 60.0
+    SCHEMA: Tuple[str, ...] = ()
+    TABLE = KEY = ""
+
+    def __init__(self, path: str, ttl: int, max_bytes: int):
+        self.path, self.ttl, self.max_bytes = path, ttl, int(max_bytes)
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _counter_schema(self) -> Tuple[str, ...]:
+        t, delta = self.TABLE, "UPDATE store_bytes SET bytes = bytes {} WHERE tbl = '{}'".format
+        return (
+            "CREATE TABLE IF NOT EXISTS store_bytes (tbl TEXT PRIMARY KEY, bytes INTEGER NOT NULL)",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_bytes_insert AFTER INSERT ON {t} BEGIN "
+            f"{delta('+ COALESCE(length(NEW.body), 0)', t)}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_bytes_delete AFTER DELETE ON {t} BEGIN "
+            f"{delta('- COALESCE(length(OLD.body), 0)', t)}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_bytes_update AFTER UPDATE OF body ON {t} BEGIN "
+            f"{delta('+ COALESCE(length(NEW.body), 0) - COALESCE(length(OLD.body), 0)', t)}; END",
+            # arquivo de antes do contador: soma uma vez o que já existe
+            f"INSERT OR IGNORE INTO store_bytes VALUES ('{t}', (SELECT COALESCE(SUM(length(body)), 0) FROM {t}))",
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA recursive_triggers=ON")  # o INSERT OR REPLACE dispara o trigger de DELETE
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in self.SCHEMA + self._counter_schema():
+                    conn.execute(statement)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _bytes(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT bytes FROM store_bytes WHERE tbl = ?", (self.TABLE,)).fetchone()[0]
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        """Apaga o que passou do TTL, no máximo uma vez a cada PURGE_EVERY segundos por worker."""
+        if now - self._last_purge > self.PURGE_EVERY:
+            self._last_purge = now
+            conn.execute(f"DELETE FROM {self.TABLE} WHERE created < ?", (now - self.ttl,))
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Apaga do mais antigo (só linhas com body) até o total caber em max_bytes."""
+        excess = self._bytes(conn) - self.max_bytes
+        if excess <= 0:
+            return
+        drop = []
+        for key, n in conn.execute(f"SELECT {self.KEY}, length(body) FROM {self.TABLE} "
+                                   f"WHERE body IS NOT NULL ORDER BY created"):
+            drop.append((key,))
+            excess -= n
+            if excess <= 0:
+                break
+        conn.executemany(f"DELETE FROM {self.TABLE} WHERE {self.KEY} = ?", drop)
+
+class RunStore(SQLiteStore):
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS stages (stage_id TEXT PRIMARY KEY, run_id TEXT NOT NULL, "
+              "stage TEXT NOT NULL, created REAL NOT NULL, body BLOB NOT NULL)",
+              "CREATE INDEX IF NOT EXISTS stages_created ON stages (created)")
+    TABLE, KEY = "stages", "stage_id"
+
+    def __init__(self, path: str = RUN_STORE_PATH, ttl: int = RUN_STORE_TTL,
+                 max_bytes: int = RUN_STORE_MAX_MB * 1024 * 1024):
+        super().__init__(path, ttl, max_bytes)
+
+    def save(self, run_id: str, stage: str, stage_id: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return  # não cabe nem sozinha: a referência a ela responde como expirada
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)", (stage_id, run_id, stage, now, body))
+        self._purge(conn, now)
+        self._evict(conn)
+
+    def load(self, stage_id: str, stage: str) -> Tuple[str, Dict]:
+        row = self._conn().execute(
+            "SELECT run_id, body FROM stages WHERE stage_id = ? AND stage = ? AND created >= ?",
+            (str(stage_id), stage, time.time() - self.ttl)).fetchone()
+        if row is None:
+            raise RunNotFound(f"{stage} '{stage_id}' não encontrado ou expirado")
+        return row[0], json.loads(row[1])
+
+    def exists(self, stage_id: str) -> bool:
+        """A saída ainda está guardada e dentro do TTL (leitura pela chave primária)?"""
+        return self._conn().execute("SELECT 1 FROM stages WHERE stage_id = ? AND created >= ?",
+                                    (str(stage_id), time.time() - self.ttl)).fetchone() is not None
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM stages").fetchone()[0]
+        return {"path": self.path, "entries": entries, "bytes": self._bytes(conn), "max_bytes": self.max_bytes}
+
+STORE = RunStore()
+
+def resolve(b: Dict) -> Optional[str]:
+    """
+    Troca as referências *_id do corpo pelas saídas guardadas (só onde não veio o
+    payload inline) e devolve o run_id a seguir: o do corpo, o da etapa
+    referenciada ou None.
+    """
+    run_id = b.get("run_id") or None
+    for ref, (field, stage) in REFERENCES.items():
+        if not b.get(ref) or b.get(field):
+            continue
+        ref_run, result = STORE.load(b[ref], stage)
+        if field == "evidence":
+            b[field] = result.get("evidence") or []
+            b.setdefault("category", result.get("category",""))
+        else:
+            b[field] = result
+        run_id = run_id or ref_run
+    return run_id
+
+def stamp(out: Dict, run_id: Optional[str]) -> Dict:
+    """Carimba run_id (novo se não houver) e um stage_id novo na saída da etapa."""
+    out["run_id"] = run_id or new_id()
+    out["stage_id"] = new_id()
+    return out
+
+def record(out: Dict, stage: str, body: bytes) -> Dict:
+    """Guarda a saída já carimbada e serializada."""
+    STORE.save(out["run_id"], stage, out["stage_id"], body)
+    return out
+
+def resolvable(body: bytes) -> bool:
+    """
+    O stage_id de uma saída já serializada ainda resolve? As saídas das etapas
+    montam cada campo à mão, então a única chave "stage_id" do JSON é a do
+    carimbo: acha-se sem parsear o corpo.
+    """
+    i = body.find(b'"stage_id"')
+    if i < 0:
+        return False
+    start = body.index(b'"', i + len(b'"stage_id"')) + 1
+    return STORE.exists(body[start:body.index(b'"', start)].decode())
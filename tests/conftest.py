@@ -0,0 +1,11 @@
+"""
+Testes de equivalência e dos armazéns locais.
+
+    pip install -r requirements.txt -r requirements-dev.txt && python -m pytest -q
+
+Os módulos do serviço ficam na raiz do repositório (sem pacote).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
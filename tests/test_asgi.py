@@ -0,0 +1,96 @@
+"""asgi.app chamado direto (sem servidor): mesmas respostas do WSGI e corpos em fluxo."""
+import asyncio
+import json
+
+import pytest
+
+import asgi
+from bench import make_corpus
+
+def scope(path, body_len=None, ctype="application/json", query=b""):
+    headers = [(b"content-type", ctype.encode())]
+    if body_len is not None:
+        headers.append((b"content-length", str(body_len).encode()))
+    return {"type": "http", "method": "POST", "path": path, "root_path": "", "query_string": query,
+            "headers": headers, "http_version": "1.1", "scheme": "http"}
+
+async def call(scope, messages, sent=None):
+    """messages: corpos a entregar (ou asyncio.Event para esperar antes do próximo)."""
+    sent = [] if sent is None else sent
+    pending = list(messages)
+
+    async def receive():
+        while pending and isinstance(pending[0], asyncio.Event):
+            await pending.pop(0).wait()
+        if not pending:
+            await asyncio.sleep(3600)
+        chunk = pending.pop(0)
+        return {"type": "http.request", "body": chunk,
+                "more_body": any(not isinstance(m, asyncio.Event) for m in pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    status = sent[0]["status"]
+    return status, b"".join(m.get("body", b"") for m in sent[1:])
+
+def pieces(data, n):
+    step = -(-len(data) // n)
+    return [data[i:i + step] for i in range(0, len(data), step)]
+
+def test_small_body_matches_wsgi():
+    body = json.dumps({"from_m2": {"grid": []}}).encode()
+    status, out = asyncio.run(call(scope("/m3-decisao", len(body)), pieces(body, 3)))
+    expected = asgi.flask_app.test_client().post("/m3-decisao", data=body, content_type="application/json")
+    strip = lambda o: {k: v for k, v in json.loads(o).items() if k not in ("run_id", "stage_id")}
+    assert (status, strip(out)) == (expected.status_code, strip(expected.data))
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_large_body_is_streamed(monkeypatch, chunked):
+    monkeypatch.setattr(asgi, "ASGI_BUFFER_BYTES", 4096)
+    findings = [{"text": t, "source_type": "website"} for t in make_corpus(2000, seed=1)]
+    body = json.dumps({"brand": "t", "category": "pizzaria", "findings": findings}).encode()
+    status, out = asyncio.run(call(scope("/m0-pesquisa", None if chunked else len(body)), pieces(body, 50)))
+    expected = asgi.flask_app.test_client().post("/m0-pesquisa", data=body, content_type="application/json")
+    assert status == 200 and json.loads(out)["evidence"] == expected.json["evidence"]
+
+def test_classify_stream_answers_before_upload_ends():
+    lines = b"".join(json.dumps({"text": t}).encode() + b"\n" for t in make_corpus(200, seed=2))
+    first, rest = lines[:len(lines) // 2], lines[len(lines) // 2:]
+
+    async def scenario():
+        release, sent = asyncio.Event(), []
+        task = asyncio.create_task(call(scope("/classify-stream", ctype="application/x-ndjson"),
+                                        [first, release, rest], sent))
+        for _ in range(500):
+            if any(m.get("body") for m in sent[1:]):
+                break
+            await asyncio.sleep(0.01)
+        early = b"".join(m.get("body", b"") for m in sent[1:])
+        release.set()
+        return early, await task
+
+    early, (status, out) = asyncio.run(scenario())
+    assert status == 200 and early and out.startswith(early)
+    assert len(out.splitlines()) == 200
+
+def test_declared_body_over_limit():
+    status, out = asyncio.run(call(scope("/m3-decisao", 10 ** 12), []))
+    assert status == 413 and json.loads(out)["limit"] == asgi.body_limit("/m3-decisao")
+
+def test_disconnect_mid_stream(monkeypatch):
+    monkeypatch.setattr(asgi, "ASGI_BUFFER_BYTES", 16)
+    sent = []
+
+    async def receive():
+        if not sent and not hasattr(receive, "done"):
+            receive.done = True
+            return {"type": "http.request", "body": b'{"brand": "t", "findings": [', "more_body": True}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope("/m0-pesquisa"), receive, send))
+    assert sent[0]["status"] == 400
@@ -0,0 +1,15 @@
+"""Boot (create_app + self-test) com limites de corpo apertados nas etapas encadeadas."""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_warm_up_with_small_body_limits(tmp_path):
+    limits = ",".join(f"/{r}=1KB" for r in ("m1-beneficios", "m2-diferenciais", "m2-diferenciais/delta",
+                                              "m3-decisao", "m4-detalhamento", "m5-planejamento"))
+    env = {**os.environ, "BODY_LIMITS": limits, "RUN_STORE_PATH": str(tmp_path / "runs.sqlite3")}
+    r = subprocess.run([sys.executable, "-c", "import app; print(app.app.config['BODY_LIMITS']['/m4-detalhamento'])"],
+                       cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert r.returncode == 0, r.stderr
+    assert r.stdout.strip() == "1024"
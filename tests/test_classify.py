@@ -0,0 +1,38 @@
+"""classify_snippet (matcher compilado + cache) contra a varredura grupo a grupo original."""
+from types import SimpleNamespace
+
+import pytest
+
+from bench import CORPORA, _classify_reference, make_corpus
+from main import CLASSIFY_CACHE_MAX_TEXT, classify_snippet, compile_keywords, keyword_pack
+
+@pytest.mark.parametrize("category", sorted(CORPORA))
+def test_classify_matches_reference(category):
+    pack = keyword_pack(category)
+    corpus = make_corpus(5000, seed=7, kind=category)
+    expected = [_classify_reference(t, pack) for t in corpus]
+    for _ in range(2):  # a segunda passada sai do cache
+        assert [classify_snippet(t, category) for t in corpus] == expected
+
+def test_compile_keywords_keeps_group_priority():
+    a, b, c = ("funcionais", "desempenho"), ("funcionais", "controle"), ("emocionais", "bem-estar")
+    table = [(["borda"], a), (["borda recheada", "forno"], b), (["forno", "lenha"], c)]
+    matcher = compile_keywords(table)
+    # "borda recheada" contém "borda" (grupo anterior) e o "forno" repetido nunca decide nada
+    assert matcher == (("borda", a), ("forno", b), ("lenha", c))
+    pack = SimpleNamespace(table=table, fallback=("funcionais", "conveniência"))
+    for text in ("Borda recheada no forno a lenha", "forno a lenha", "só lenha", "nada", ""):
+        t = text.lower()
+        assert next((tag for k, tag in matcher if k in t), pack.fallback) == _classify_reference(text, pack)
+
+def test_long_texts_skip_the_cache():
+    pack = keyword_pack("pizzaria")
+    pack.cache.clear()
+    long_text = "forno " * (CLASSIFY_CACHE_MAX_TEXT // 6 + 1)
+    assert classify_snippet(long_text, "pizzaria") == _classify_reference(long_text, pack)
+    classify_snippet("forno a lenha", "pizzaria")
+    assert pack.cache.stats()["size"] == 1
+
+def test_classify_snippet_accepts_category_keyword():
+    assert classify_snippet("entrega rápida", category="generico") == classify_snippet("entrega rápida", "generico")
+    assert classify_snippet.__wrapped__.__name__ == "classify_snippet"
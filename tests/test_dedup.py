@@ -0,0 +1,61 @@
+"""Quase-duplicatas: LSH contra a força bruta, textos sem palavras e o bloco "dedup" da M0."""
+import pytest
+
+import dedup
+from bench import CORPORA, _brute_groups, make_dup_findings
+from main import create_app
+
+@pytest.mark.parametrize("kind", sorted(CORPORA))
+@pytest.mark.parametrize("threshold", [0.5, 0.8])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_brute_force(kind, threshold, seed):
+    texts = [f["text"] for f in make_dup_findings(600, 0.4, seed, kind)]
+    groups = dedup.near_duplicates(texts, threshold)
+    assert sorted(i for g in groups for i in g) == list(range(len(texts)))
+    shingles = [dedup.shingles(dedup.tokens(t)) for t in texts]
+    for g in groups:
+        assert g == sorted(g)                  # o representante é o primeiro do grupo
+        assert all(dedup.jaccard(shingles[i], shingles[g[0]]) >= threshold for i in g)
+    brute = _brute_groups(texts, threshold)
+    # o LSH nunca junta demais; pode perder um par no limiar com chance <= 1 - MIN_RECALL
+    assert brute <= len(groups) <= brute + brute // 100
+
+def test_empty_and_emoji_only_texts():
+    assert dedup.near_duplicates([]) == []
+    texts = ["", "😀", "😀", "🎉", " ", "🍕 pizza boa", "Pizza boa! 🎉", "😀 "]
+    # sem palavras, só o texto idêntico (sem espaços nas pontas, minúsculo) é duplicata
+    assert dedup.near_duplicates(texts, 0.8) == [[0, 4], [1, 2, 7], [3], [5, 6]]
+    assert dedup.near_duplicates(["😀", "🎉"], 0.01) == [[0], [1]]
+
+def test_m0_dedup_block_and_sources():
+    findings = [
+        {"text": "Pizza no forno a lenha com borda recheada", "source_type": "Website", "url": "https://a"},
+        {"text": "pizza no forno a lenha com borda recheada!", "source_type": "instagram", "url": "https://b"},
+        {"text": "Pizza no forno a lenha com borda recheada", "source_type": "website", "url": "https://a"},
+        {"text": "Entrega grátis no bairro", "source_type": "maps"},
+        {"text": "😀😀", "source_type": "facebook"},
+        {"text": "   "},
+    ]
+    r = create_app(warmup=False).test_client().post(
+        "/m0-pesquisa", json={"brand": "x", "findings": findings, "dedup": True, "dedup_threshold": 0.8})
+    assert r.status_code == 200
+    out = r.get_json()
+    assert out["dedup"] == {"threshold": 0.8, "input": 5, "output": 3, "removed": 2, "reduction": 0.4}
+    assert [e["text"] for e in out["evidence"]] == [findings[0]["text"], findings[3]["text"], "😀😀"]
+    assert out["evidence"][0]["source_type"] == "website"
+    assert out["evidence"][0]["sources"] == [
+        {"source_type": "website", "source_name": "N/A", "url": "https://a", "captured_at": ""},
+        {"source_type": "instagram", "source_name": "N/A", "url": "https://b", "captured_at": ""},
+    ]
+    assert [len(e["sources"]) for e in out["evidence"][1:]] == [1, 1]
+
+def test_m0_without_dedup_keeps_everything():
+    body = {"brand": "x", "findings": [{"text": "a b c"}, {"text": "a b c"}]}
+    out = create_app(warmup=False).test_client().post("/m0-pesquisa", json=body).get_json()
+    assert "dedup" not in out and len(out["evidence"]) == 2
+    assert "sources" not in out["evidence"][0]
+
+@pytest.mark.parametrize("threshold", [0, 1.5, "0.8", True])
+def test_m0_rejects_bad_threshold(threshold):
+    body = {"brand": "x", "findings": [{"text": "a"}], "dedup": True, "dedup_threshold": threshold}
+    assert create_app(warmup=False).test_client().post("/m0-pesquisa", json=body).status_code == 400
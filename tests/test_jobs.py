@@ -0,0 +1,62 @@
+"""Fila de jobs: resultado, backpressure, limite em bytes e worker perdido."""
+import threading
+import time
+
+import pytest
+
+import jobs
+
+def wait(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id, with_body=True)
+        if job["status"] not in jobs.PENDING:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} não terminou")
+
+@pytest.fixture
+def queue(tmp_path):
+    q = jobs.JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, queue_max=2, max_bytes=1000)
+    yield q
+    q.shutdown()
+
+def test_result_and_failure(queue):
+    ok = queue.submit("m0", lambda: (200, b'{"ok":true}'))
+    bad = queue.submit("m0", lambda: 1 / 0)
+    assert wait(queue, ok)["body"] == b'{"ok":true}'
+    assert (wait(queue, bad)["status"], wait(queue, bad)["http_status"]) == ("failed", 500)
+    assert queue.stats()["done"] == 1 and queue.stats()["failed"] == 1
+
+def test_queue_full(queue):
+    gate = threading.Event()
+    ids = [queue.submit("m0", lambda: (gate.wait(5), (200, b"{}"))[1]) for _ in range(3)]
+    with pytest.raises(jobs.QueueFull) as e:
+        queue.submit("m0", lambda: (200, b"{}"))
+    assert e.value.retry_after >= jobs.JOB_RETRY_MIN
+    gate.set()
+    assert all(wait(queue, i)["status"] == "done" for i in ids)
+
+def test_results_over_max_bytes(queue):
+    big = queue.submit("m0", lambda: (200, b"x" * 2000))
+    assert (wait(queue, big)["http_status"], wait(queue, big)["body"]) == (507, jobs.JOB_TOO_LARGE)
+    ids = []
+    for _ in range(3):
+        ids.append(queue.submit("m0", lambda: (200, b"y" * 400)))
+        wait(queue, ids[-1])
+    # o mais antigo sai para os outros caberem
+    assert queue.get(ids[0]) is None and queue.get(ids[2])["status"] == "done"
+
+def test_lost_worker(queue):
+    queue._conn().execute("INSERT INTO jobs (job_id, kind, status, pid, created, updated) "
+                          "VALUES ('x', 'm0', 'running', 2147483646, ?, ?)", (time.time(), time.time()))
+    job = queue.get("x", with_body=True)
+    assert (job["status"], job["http_status"], job["body"]) == ("failed", 503, jobs.JOB_LOST)
+
+def test_byte_counter_follows_updates(queue):
+    ids = []
+    for n in (300, 200):
+        ids.append(queue.submit("m0", lambda n=n: (200, b"z" * n)))
+        wait(queue, ids[-1])
+    conn = queue._conn()
+    assert queue._bytes(conn) == conn.execute("SELECT SUM(length(body)) FROM jobs").fetchone()[0] == 500
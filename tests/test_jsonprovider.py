@@ -0,0 +1,23 @@
+"""Provedores JSON: mesma saída compacta, em str (dumps) e em bytes (dumpb)."""
+import pytest
+
+import jsonprovider
+from main import create_app
+
+PROVIDERS = [name for name in jsonprovider.PROVIDERS if name != "orjson" or jsonprovider.orjson is not None]
+
+OBJ = {"b": [1, 2.5, None, True], "a": {"ç": "aspas\"e\\barra", "n": -3}, "vazio": []}
+
+@pytest.fixture(params=PROVIDERS)
+def app(request, monkeypatch):
+    monkeypatch.setattr(jsonprovider, "JSON_PROVIDER", request.param)
+    return create_app(warmup=False)
+
+def test_dumps_is_compact_and_matches_dumpb(app):
+    out = app.json.dumps(OBJ)
+    assert out == app.json.dumpb(OBJ).decode()
+    assert ", " not in out and ": " not in out
+
+def test_stage_response_is_compact(app):
+    r = app.test_client().post("/m3-decisao", json={"brand": "x", "from_m2": {"grid": []}})
+    assert r.status_code == 200 and r.data.startswith(b'{"brand":"x","decisions":[]')
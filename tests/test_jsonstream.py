@@ -0,0 +1,68 @@
+"""jsonstream.read_object contra json.loads e o get_json do Flask."""
+import io
+import json
+import random
+
+import pytest
+
+import jsonstream
+from main import create_app, m0_finding, request_body
+
+class Trickle(io.RawIOBase):
+    """Stream que entrega no máximo `step` bytes por read (pedaços cortam strings, números e UTF-8)."""
+
+    def __init__(self, data: bytes, step: int):
+        self.data, self.pos, self.step = data, 0, step
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        n = self.step if n is None or n < 0 else min(n, self.step)
+        out = self.data[self.pos:self.pos + n]
+        self.pos += len(out)
+        return out
+
+def make_body(seed: int) -> dict:
+    rnd = random.Random(seed)
+    words = ["pizza", "forno", "ção", "naïve", "😀", 'aspas "duplas"', "barra \\ invertida", " ", "tab\t"]
+    findings = [{"text": " ".join(rnd.choice(words) for _ in range(rnd.randint(0, 30))),
+                 "source_type": rnd.choice(["Website", "maps", ""]), "url": "https://example.com/" + "x" * rnd.randint(0, 300),
+                 "score": rnd.choice([0, -1, 1e-7, 123456789012345678901234567890, 3.5, True, None])}
+                for _ in range(rnd.randint(0, 1500))]
+    return {"brand": "ç" * seed, "n": 10 ** seed, "findings": findings, "nested": {"findings": [1, [2, {}]]},
+            "empty": [], "flag": False, "category": "pizzaria"}
+
+def expected(b: dict) -> dict:
+    return {**b, "findings": [x for x in map(m0_finding, b["findings"]) if x is not None]}
+
+@pytest.mark.parametrize("seed", range(1, 7))
+@pytest.mark.parametrize("step", [1 << 20, 4093, 17])
+def test_read_object_matches_json_loads(seed, step):
+    b = make_body(seed)
+    for data in (json.dumps(b).encode(), json.dumps(b, ensure_ascii=False, indent=seed).encode(),
+                 b"\xef\xbb\xbf" + json.dumps(b).encode()):
+        assert jsonstream.read_object(Trickle(data, step), {"findings": m0_finding}) == expected(b)
+
+@pytest.mark.parametrize("data", [b"", b"{", b'{"a":1', b'{"a":1,}', b'{"a" 1}', b'{"a":[1,2}', b"{1:2}",
+                                  b'{"a":1} x', b'{"findings":[{"text":"x"},]}', b'{"a":"\xff"}', b'{"a":NaX}'])
+def test_invalid_bodies_raise_value_error(data):
+    with pytest.raises(ValueError):
+        json.loads(data)
+    with pytest.raises(ValueError):
+        jsonstream.read_object(Trickle(data, 3), {"findings": m0_finding})
+
+def test_top_level_must_be_object():
+    with pytest.raises(ValueError):
+        jsonstream.read_object(io.BytesIO(b"[1, 2]"), {})
+
+@pytest.mark.parametrize("data", [json.dumps(make_body(3)).encode(), b"{}", b"not json", b'{"a":1} {}'])
+def test_request_body_matches_get_json(data):
+    app = create_app(warmup=False)
+    with app.test_request_context("/m0-pesquisa", method="POST", data=data, content_type="application/json"):
+        plain = request_body()
+    with app.test_request_context("/m0-pesquisa", method="POST", data=data, content_type="application/json"):
+        streamed = request_body({"findings": m0_finding})
+    if isinstance(plain.get("findings"), list):
+        plain = expected(plain)
+    assert streamed == plain
@@ -0,0 +1,81 @@
+"""Pacotes de palavras-chave: escolha pela category e hot reload."""
+import json
+import os
+import shutil
+
+import pytest
+
+import main
+from main import KEYWORD_DEFAULT_PACK, classify_snippet, create_app, keyword_pack
+
+@pytest.mark.parametrize("category", [5, 1.5, ["pizzaria"], {"a": 1}, True, None, "", "  ", "desconhecida"])
+def test_unusable_category_uses_default_pack(category):
+    assert keyword_pack(category).name == KEYWORD_DEFAULT_PACK
+
+@pytest.mark.parametrize("path,body", [
+    ("/m1-beneficios", {"category": 5, "evidence": [{"text": "pix"}]}),
+    ("/m0-pesquisa", {"category": 5, "findings": [{"text": "pix"}]}),
+    ("/m0-competidores", {"category": [1], "competitors_findings": [{"competitor": "a", "findings": [{"text": "pix"}]}]}),
+    ("/pipeline", {"category": {"a": 1}, "findings": [{"text": "pix"}]}),
+])
+def test_non_string_category_is_not_an_error(path, body):
+    assert create_app(warmup=False).test_client().post(path, json=body).status_code == 200
+
+# =========================
+# Hot reload (KEYWORD_PACKS_CHECK=0: confere os arquivos a cada chamada)
+# =========================
+CONVENIENCIA, CONTROLE = ("funcionais", "conveniência"), ("funcionais", "controle")
+
+@pytest.fixture
+def packs_dir(tmp_path, monkeypatch):
+    for name in ("pizzaria", "generico"):
+        shutil.copy(os.path.join(main.KEYWORD_PACKS_DIR, f"{name}.json"), tmp_path)
+    monkeypatch.setattr(main, "KEYWORD_PACKS_CHECK", 0)
+    monkeypatch.setattr(main, "_packs_next_check", 0.0)  # a próxima verificação agendada pelos outros testes
+    monkeypatch.setattr(main, "KEYWORD_PACKS_DIR", str(tmp_path))
+    main.reload_keywords()
+    yield tmp_path
+    monkeypatch.undo()
+    main.reload_keywords()
+
+def write_pack(path, keyword, tag, aliases=(), bump=1):
+    path.write_text(json.dumps({"aliases": list(aliases), "groups": [{"tag": list(tag), "keywords": [keyword]}]}))
+    st = path.stat()  # mtime sempre diferente, mesmo dentro da resolução do sistema de arquivos
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump * 10 ** 9))
+
+def test_new_and_edited_pack(packs_dir):
+    pack = packs_dir / "padaria.json"
+    write_pack(pack, "fermento", CONTROLE)
+    assert classify_snippet("pão com fermento", "padaria") == CONTROLE
+    write_pack(pack, "forno", CONTROLE, bump=2)
+    assert keyword_pack("padaria").matcher == (("forno", CONTROLE),)
+    assert classify_snippet("pão com fermento", "padaria") == CONVENIENCIA  # fallback padrão do pacote
+
+def test_broken_file_keeps_previous_pack(packs_dir):
+    pack = packs_dir / "padaria.json"
+    write_pack(pack, "fermento", CONTROLE)
+    before = keyword_pack("padaria")
+    pack.write_text("{ quebrado")
+    os.utime(pack, ns=(0, pack.stat().st_mtime_ns + 5 * 10 ** 9))
+    assert keyword_pack("padaria") is before
+    assert classify_snippet("pão com fermento", "padaria") == CONTROLE
+
+def test_deleted_pack_falls_back_to_default(packs_dir):
+    write_pack(packs_dir / "padaria.json", "fermento", CONTROLE)
+    assert keyword_pack("padaria").name == "padaria"
+    (packs_dir / "padaria.json").unlink()
+    assert keyword_pack("padaria").name == KEYWORD_DEFAULT_PACK
+
+def test_deleted_default_pack_is_kept(packs_dir):
+    default = keyword_pack(None)
+    (packs_dir / f"{KEYWORD_DEFAULT_PACK}.json").unlink()
+    assert keyword_pack(None) is default
+
+def test_aliases(packs_dir):
+    write_pack(packs_dir / "padaria.json", "fermento", CONTROLE, aliases=["Panificadora", "pão"])
+    for category in ("padaria", "PADARIA ", "panificadora", "Pão"):
+        assert keyword_pack(category).name == "padaria"
+    assert keyword_pack("geral").name == "generico"  # alias do pacote de fábrica
+    # um alias não toma o nome de outro pacote
+    write_pack(packs_dir / "padaria.json", "fermento", CONTROLE, aliases=["generico"], bump=2)
+    assert keyword_pack("generico").name == "generico"
@@ -0,0 +1,18 @@
+"""M0b nos pools (thread e processo) contra o caminho serial."""
+import pytest
+
+import main
+from bench import make_competitors
+from main import run_m0_competidores
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+@pytest.mark.parametrize("extra", [{}, {"dedup": True, "matrix_format": "mask"}])
+def test_parallel_matches_serial(monkeypatch, backend, extra):
+    monkeypatch.setattr(main, "M0B_PARALLEL_MIN", 2)
+    comp = make_competitors(12, 30, seed=9)
+    comp[3]["findings"] = []                 # competidor vazio sai da saída
+    comp[5]["competitor"] = "  "
+    body = {"brand": "t", "category": "pizzaria", "competitors_findings": comp, **extra}
+    serial = run_m0_competidores(body, backend="serial")
+    assert run_m0_competidores(body, backend=backend, workers=3) == serial
+    assert len(serial["competitors"]) == 10
@@ -0,0 +1,31 @@
+"""Lote da M2 (numpy e máscaras em int) contra a M2 marca a marca."""
+import random
+
+import pytest
+
+import main
+from bench import make_pipeline_body, make_portfolio
+from main import M2_NUMPY_MIN, comp_counts, m2_codes, m2_codes_batch, run_m2_batch, run_m2_diferenciais, run_pipeline
+
+@pytest.fixture(scope="module")
+def stages():
+    return run_pipeline({**make_pipeline_body(21, 40, seed=5), "stages": ["m0b", "m1"]})["stages"]
+
+def test_numpy_installed():
+    assert main.np is not None, "numpy está no requirements.txt; sem ele o caminho vetorizado não roda"
+
+@pytest.mark.parametrize("n", [1, M2_NUMPY_MIN - 1, M2_NUMPY_MIN, 200])
+def test_batch_matches_single(stages, n):
+    brands = make_portfolio(stages["m1"], n, seed=n)
+    batch = run_m2_batch({"brands": brands, "from_competitors": stages["m0b"]})["brands"]
+    assert batch == [run_m2_diferenciais({**e, "from_competitors": stages["m0b"]}) for e in brands]
+
+def test_numpy_and_int_paths_agree(monkeypatch):
+    rnd = random.Random(3)
+    full = (1 << len(main.SUB_BENEFITS)) - 1
+    masks = [[rnd.randint(0, full) for _ in range(100)] for _ in range(3)]
+    parity, only = rnd.randint(0, full), [rnd.random() < 0.5 for _ in range(100)]
+    vectorized, counts = m2_codes_batch(*masks, parity, only), comp_counts(masks[0])
+    monkeypatch.setattr(main, "np", None)
+    assert vectorized == m2_codes_batch(*masks, parity, only) == [m2_codes(*m, parity, o) for *m, o in zip(*masks, only)]
+    assert counts == comp_counts(masks[0])
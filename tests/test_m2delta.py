@@ -0,0 +1,30 @@
+"""run_m2_delta, passo a passo, contra a M2 recalculada do zero."""
+import random
+
+import pytest
+
+from bench import make_pipeline_body
+from main import run_m2_delta, run_m2_diferenciais, run_pipeline
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_delta_matches_full_recompute(seed):
+    rnd = random.Random(seed)
+    body = make_pipeline_body(6, 40, seed=seed)
+    stages = run_pipeline({**body, "stages": ["m0b", "m1"], "approved": []})["stages"]
+    m1, m0b = stages["m1"], stages["m0b"]
+    keys = [(a["pillar"], a["sub_benefit"]) for a in m1["attributes"]]
+    assert keys
+    only = False
+    prev = run_m2_diferenciais({"brand": "t", "from_m1": m1, "from_competitors": m0b, "use_only_approved": only})
+    for _ in range(150):
+        changes = [{"pillar": p, "sub_benefit": s, "approved": rnd.random() < 0.6}
+                   for p, s in rnd.sample(keys, rnd.randint(1, min(3, len(keys))))]
+        if rnd.random() < 0.1:
+            only = not only
+        prev, _ = run_m2_delta({"brand": "t", "from_m2": prev, "use_only_approved": only, "changes": changes})
+        for c in changes:
+            for a in m1["attributes"]:
+                if (a["pillar"], a["sub_benefit"]) == (c["pillar"], c["sub_benefit"]):
+                    a["approved"] = c["approved"]
+        full = run_m2_diferenciais({"brand": "t", "from_m1": m1, "from_competitors": m0b, "use_only_approved": only})
+        assert prev == full
@@ -0,0 +1,59 @@
+"""Cache de respostas: limites em bytes dos dois níveis e a busca pelo corpo."""
+import json
+
+from respcache import DiskTier, MemoryTier, ResponseCache
+
+def test_memory_tier_lru_by_bytes():
+    tier = MemoryTier(250, ttl=60)
+    for k in "abc":
+        tier.put(k, "e" + k, b"x" * 100)
+    assert tier.get("a") is None and tier.stats()["bytes"] == 200
+    tier.get("b")
+    tier.put("d", "ed", b"x" * 100)
+    assert tier.get("c") is None and tier.get("b") == ("eb", b"x" * 100)
+
+def test_disk_tier_evicts_oldest(tmp_path):
+    tier = DiskTier(str(tmp_path / "cache.sqlite3"), max_bytes=250, ttl=60)
+    for k in "abc":
+        tier.put(k, "e" + k, b"x" * 100)
+    assert tier.get("a") is None and tier.get("c")[:2] == ("ec", b"x" * 100)
+    assert tier.stats()["bytes"] == 200
+    tier.put("big", "e", b"x" * 300)
+    assert tier.get("big") is None
+
+def test_find_by_raw_bytes_and_canonical_body(tmp_path):
+    cache = ResponseCache("t", memory_bytes=0, disk_path=str(tmp_path / "cache.sqlite3"))
+    body = {"b": 1, "a": [1, 2]}
+    key, hit, tier, _ = cache.find("m3", json.dumps(body).encode(), lambda: body)
+    assert hit is None and tier == "miss"
+    etag = cache.put(key, b'{"ok":true}')
+    # mesmo corpo com outra ordem de chaves e espaços: mesma chave
+    other = b'{ "a": [1, 2], "b": 1 }'
+    assert cache.find("m3", other, lambda: json.loads(other))[1:3] == ((etag, b'{"ok":true}'), "disk")
+    # a repetição exata dos bytes nem parseia
+    assert cache.find("m3", other, lambda: 1 / 0)[2] == "disk"
+
+def test_stale_hit_counts_as_miss():
+    cache = ResponseCache("t", memory_bytes=1 << 20)
+    key, _, _, _ = cache.find("m3", b"{}", lambda: {})
+    cache.put(key, b'{"ok":true}')
+    assert cache.find("m3", b"{}", lambda: {}, valid=lambda body: True)[2] == "memory"
+    assert cache.find("m3", b"{}", lambda: {}, valid=lambda body: False) == (key, None, "miss", {})
+
+def test_cached_stage_id_evicted_from_run_store(tmp_path, monkeypatch):
+    import main
+    import runs
+    monkeypatch.setattr(main, "RESPONSES", ResponseCache("t"))
+    monkeypatch.setattr(runs, "STORE", runs.RunStore(str(tmp_path / "runs.sqlite3"), ttl=60, max_bytes=12_000))
+    c = main.create_app(warmup=False).test_client()
+    m0 = c.post("/m0-pesquisa", json={"brand": "x", "findings": main.SELF_TEST_FINDINGS}).get_json()
+    m1 = c.post("/m1-beneficios", json={"brand": "x", "from_m0_id": m0["stage_id"]}).get_json()
+    body = {"brand": "x", "from_m1": m1}
+    first = c.post("/m2-diferenciais", json=body).get_json()
+    assert c.post("/m2-diferenciais", json=body).get_json() == first  # acerto no cache
+    while runs.STORE.exists(first["stage_id"]):  # outras etapas empurram a M2 para fora do armazém
+        c.post("/m0-pesquisa", json={"brand": "x", "findings": main.SELF_TEST_FINDINGS})
+    again = c.post("/m2-diferenciais", json=body).get_json()
+    assert again["stage_id"] != first["stage_id"]
+    assert c.post("/m2-diferenciais", json=body).get_json() == again  # a resposta nova voltou ao cache
+    assert c.post("/m3-decisao", json={"brand": "x", "from_m2_id": again["stage_id"]}).status_code == 200
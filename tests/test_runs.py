@@ -0,0 +1,59 @@
+"""Armazém de execuções: TTL e limite em bytes."""
+import pytest
+
+from runs import RunNotFound, RunStore
+
+def body(n: int) -> bytes:
+    return b'{"x":"' + b"a" * (n - 8) + b'"}'
+
+def test_save_and_load(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"))
+    store.save("r1", "m1", "s1", b'{"attributes":[]}')
+    assert store.load("s1", "m1") == ("r1", {"attributes": []})
+    with pytest.raises(RunNotFound):
+        store.load("s1", "m2")
+
+def test_oldest_evicted_over_max_bytes(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"), max_bytes=2500)
+    for i in range(4):
+        store.save("r", "m0", f"s{i}", body(1000))
+    assert store.stats()["bytes"] <= 2500
+    for i in (0, 1):
+        with pytest.raises(RunNotFound):
+            store.load(f"s{i}", "m0")
+    assert [store.load(f"s{i}", "m0")[0] for i in (2, 3)] == ["r", "r"]
+
+def test_body_above_max_bytes_is_not_stored(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"), max_bytes=500)
+    store.save("r", "m0", "big", body(1000))
+    assert store.stats()["entries"] == 0
+
+def test_expired(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"), ttl=-1)
+    store.save("r", "m0", "s", body(100))
+    with pytest.raises(RunNotFound):
+        store.load("s", "m0")
+
+def real_bytes(store):
+    return store._conn().execute("SELECT COALESCE(SUM(length(body)), 0) FROM stages").fetchone()[0]
+
+def test_byte_counter_stays_exact(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"), max_bytes=5000)
+    for i in range(10):
+        store.save("r", "m0", f"s{i % 7}", body(300 + 100 * i))  # s0–s2 substituídas (INSERT OR REPLACE)
+        assert store.stats()["bytes"] == real_bytes(store) <= 5000
+    store._last_purge, store.ttl = 0.0, 0
+    store.save("r", "m0", "last", body(100))  # a limpeza do TTL apaga todas as anteriores
+    assert store.stats()["bytes"] == real_bytes(store) == 100
+
+def test_counter_initialised_from_existing_file(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "runs.sqlite3")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(RunStore.SCHEMA[0])
+    conn.execute("INSERT INTO stages VALUES ('old', 'r', 'm0', 1e12, ?)", (body(700),))
+    conn.close()
+    store = RunStore(path)
+    assert store.stats()["bytes"] == 700
+    store.save("r", "m0", "new", body(300))
+    assert store.stats()["bytes"] == 1000
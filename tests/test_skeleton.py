@@ -0,0 +1,37 @@
+"""Esqueletos pré-codificados da M4/M5: mesmos bytes que serializar a saída inteira."""
+import pytest
+
+import jsonprovider
+from bench import SKELETON_NAMES, make_m4_m5_inputs
+from main import create_app, encode_m4, encode_m5, run_m4_detalhamento, run_m5_planejamento
+
+PROVIDERS = [name for name in jsonprovider.PROVIDERS if name != "orjson" or jsonprovider.orjson is not None]
+
+IDS = {"run_id": "r" * 32, "stage_id": "s" * 32}
+
+@pytest.fixture(params=PROVIDERS)
+def app(request, monkeypatch):
+    monkeypatch.setattr(jsonprovider, "JSON_PROVIDER", request.param)
+    app = create_app(warmup=False)
+    with app.app_context():
+        yield app
+
+def assert_same_bytes(app, b):
+    assert encode_m4(b, IDS) == app.json.dumpb({**run_m4_detalhamento(b), **IDS})
+    assert encode_m5(b, IDS) == app.json.dumpb({**run_m5_planejamento(b), **IDS})
+
+@pytest.mark.parametrize("name", SKELETON_NAMES)
+def test_hard_names(app, name):
+    decisions = [{"pillar": name, "sub_benefit": name}, {"pillar": "Sabor", "sub_benefit": name},
+                 {"pillar": name, "sub_benefit": None}]
+    detailed = [{"differential": name}, {"differential": f"{name}/{name}"}]
+    assert_same_bytes(app, {"brand": name, "from_m3": {"decisions": decisions}, "from_m4": {"detailed": detailed}})
+
+@pytest.mark.parametrize("b", [{}, {"brand": 7, "from_m3": {"decisions": []}, "from_m4": {"detailed": []}},
+                               {"from_m3": {"decisions": [{}]}, "from_m4": {"detailed": [{}, {"differential": 3.5}]}}])
+def test_empty_and_missing_fields(app, b):
+    assert_same_bytes(app, b)
+
+def test_generated_inputs(app):
+    m4, m5 = make_m4_m5_inputs(300, seed=5)
+    assert_same_bytes(app, {**m4, **m5})